@@ -2,17 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import date
-from core.logic import (
-    get_month_bounds,
-    totals_for_period,
-    current_savings,
-    expenses_by_category,
-    monthly_cashflow,
-)
+from core.logic import dashboard
 from core.utils import ensure_seed_data
-from core import storage as S
+from core import perf, scope
 
 st.set_page_config(page_title="FlowFox – Personal Finance Studio", page_icon="🦊", layout="wide")
+perf.page("Dashboard")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))  # this session's ledger (see core.scope)
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
 ensure_seed_data()
 
 # --------- light styling for "cards" ---------
@@ -40,11 +40,10 @@ with st.sidebar:
     year = st.number_input("Year", 2000, 2100, today.year, step=1)
     month = st.number_input("Month", 1, 12, today.month, step=1)
 
-start_dt, end_dt = get_month_bounds(year, month)
+dash = dashboard(year, month, months=6)
 
 # --------- KPIs ---------
-income_sum, expense_sum, net_sum = totals_for_period(start_dt, end_dt)
-savings = current_savings()
+income_sum, expense_sum, net_sum, savings = dash.income, dash.expenses, dash.net, dash.savings
 
 c1, c2, c3, c4 = st.columns(4)
 with c1:
@@ -72,44 +71,28 @@ with ql4: st.markdown('<div class="section quick-links">📊 <a href="/5_Reports
 st.markdown(" ")
 
 # --------- This-month breakdown (donut + bar) ---------
-tx = S.load_transactions()
-cats = S.load_categories()
-
 left, right = st.columns([1, 1])
-if not tx.empty:
-    tx["date"] = pd.to_datetime(tx["date"], errors="coerce")
-    tx_m = tx[(tx["date"] >= pd.to_datetime(start_dt)) & (tx["date"] <= pd.to_datetime(end_dt))]
-    exp_m = tx_m[tx_m["type"] == "expense"]
-    inc_m = tx_m[tx_m["type"] == "income"]
-
-    if not exp_m.empty:
-        em = exp_m.merge(cats[["id", "name"]].rename(columns={"id": "category_id", "name": "category"}), on="category_id", how="left")
-        exp_by_cat = em.groupby("category", dropna=False)["amount"].sum().reset_index().sort_values("amount", ascending=False)
-        with left:
-            st.subheader("This Month • Expense Mix")
-            fig = px.pie(exp_by_cat, names="category", values="amount", hole=0.55)
-            fig.update_traces(textposition="inside", textinfo="percent+label")
-            st.plotly_chart(fig, use_container_width=True)
-    else:
-        left.info("No expenses this month yet.")
-
-    if not inc_m.empty:
-        im = inc_m.merge(cats[["id", "name"]].rename(columns={"id": "category_id", "name": "category"}), on="category_id", how="left")
-        inc_by_cat = im.groupby("category", dropna=False)["amount"].sum().reset_index().sort_values("amount", ascending=False)
-        with right:
-            st.subheader("This Month • Income by Category")
-            fig2 = px.bar(inc_by_cat, x="category", y="amount")
-            fig2.update_layout(xaxis_title="", yaxis_title="Amount")
-            st.plotly_chart(fig2, use_container_width=True)
-    else:
-        right.info("No income this month yet.")
+if dash.expense_by_category.empty:
+    left.info("No expenses this month yet.")
+else:
+    with left:
+        st.subheader("This Month • Expense Mix")
+        fig = px.pie(dash.expense_by_category, names="category", values="amount", hole=0.55)
+        fig.update_traces(textposition="inside", textinfo="percent+label")
+        st.plotly_chart(fig, use_container_width=True)
+
+if dash.income_by_category.empty:
+    right.info("No income this month yet.")
 else:
-    left.info("Add your first transaction to see insights.")
-    right.info("Add your first transaction to see insights.")
+    with right:
+        st.subheader("This Month • Income by Category")
+        fig2 = px.bar(dash.income_by_category, x="category", y="amount")
+        fig2.update_layout(xaxis_title="", yaxis_title="Amount")
+        st.plotly_chart(fig2, use_container_width=True)
 
 st.markdown(" ")
 st.subheader("Trends (Last 6 Months)")
-cf = monthly_cashflow(reference_year=year, reference_month=month, months=6)
+cf = dash.trend
 if cf.empty:
     st.info("Add transactions to view trends.")
 else:
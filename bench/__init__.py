@@ -0,0 +1,9 @@
+"""Benchmarks for core.storage and core.logic on synthetic ledgers.
+
+    python -m bench                                  # 1k, 100k and 1M rows, print results
+    python -m bench --sizes 1k,100k --out baseline.json
+    python -m bench --compare baseline.json          # exit 1 on slowdowns over --threshold
+
+Each ledger size runs in its own process against a freshly generated DATA_DIR
+(see bench.synth), so timings and peak memory don't leak between sizes.
+"""
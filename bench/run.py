@@ -0,0 +1,74 @@
+"""Run the benchmarks, write a JSON baseline, or compare against one."""
+import argparse, json, os, platform, subprocess, sys, tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+UNITS = {"k": 1_000, "M": 1_000_000}
+
+def parse_size(text: str) -> int:
+    text = text.strip()
+    return int(float(text[:-1]) * UNITS[text[-1]]) if text[-1] in UNITS else int(text)
+
+def _worker(cwd: str, *args) -> dict:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, os.environ.get("PYTHONPATH")]))}
+    out = subprocess.run([sys.executable, "-m", "bench.worker", *map(str, args)], cwd=cwd, env=env,
+                         check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+def run(sizes, seed: int = 0, repeat: int = 3) -> dict:
+    import pandas as pd
+    from core import config
+    results = {"meta": {"created": datetime.now().isoformat(timespec="seconds"), "python": platform.python_version(),
+                        "pandas": pd.__version__, "backend": config.BACKEND, "format": config.FORMAT,
+                        "seed": seed, "repeat": repeat},
+               "sizes": {}}
+    for n in sizes:
+        with tempfile.TemporaryDirectory(prefix="flowfox-bench-") as cwd:
+            gen = _worker(cwd, "generate", n, seed)
+            results["sizes"][str(n)] = {"generate_s": gen["generate_s"], **_worker(cwd, "measure", repeat)}
+        print(f"{n:>9,} rows: done", file=sys.stderr)
+    return results
+
+def compare(old: dict, new: dict, threshold: float, min_delta: float = 0.002) -> list:
+    """(size, operation, old best_s, new best_s) for every slowdown beyond threshold (and min_delta seconds)."""
+    slower = []
+    for size, ops in new["sizes"].items():
+        for op, r in ops.items():
+            base = old.get("sizes", {}).get(size, {}).get(op)
+            if isinstance(r, dict) and isinstance(base, dict):
+                if r["best_s"] > base["best_s"] * (1 + threshold) and r["best_s"] - base["best_s"] > min_delta:
+                    slower.append((size, op, base["best_s"], r["best_s"]))
+    return slower
+
+def report(results: dict):
+    for size, ops in results["sizes"].items():
+        print(f"\n{int(size):,} transactions (generated in {ops['generate_s']:.1f}s)")
+        print(f"  {'operation':<26}{'first':>10}{'best':>10}{'peak MB':>10}{'max RSS MB':>12}")
+        for op, r in ops.items():
+            if isinstance(r, dict):
+                rss = "-" if r["max_rss_mb"] is None else f"{r['max_rss_mb']:.0f}"
+                print(f"  {op:<26}{r['first_s'] * 1000:>8.1f}ms{r['best_s'] * 1000:>8.1f}ms{r['peak_mb']:>10.1f}{rss:>12}")
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m bench", description=__doc__)
+    p.add_argument("--sizes", default="1k,100k,1M", help="comma-separated ledger sizes, e.g. 1k,100k,1M,5M")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--repeat", type=int, default=3, help="timed calls per operation after the first")
+    p.add_argument("--out", help="write the results to this JSON file")
+    p.add_argument("--compare", help="baseline JSON to compare against; exits 1 on slowdowns")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, as a fraction (default 0.25)")
+    args = p.parse_args(argv)
+
+    results = run([parse_size(s) for s in args.sizes.split(",")], args.seed, args.repeat)
+    report(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(json.load(f), results, args.threshold)
+        for size, op, before, after in slower:
+            print(f"SLOWER  {int(size):,} rows  {op}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms ({after / before:.2f}x)")
+        print(f"\n{len(slower)} slowdown(s) beyond {args.threshold:.0%}." if slower else "\nNo slowdowns beyond threshold.")
+        return 1 if slower else 0
+    return 0
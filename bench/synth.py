@@ -0,0 +1,81 @@
+"""Deterministic synthetic ledgers with realistic skew.
+
+A few accounts take most of the activity, category use falls off Zipf-like,
+amounts are log-normal around a per-category typical value, and roughly one
+transaction in eight is income or savings. The same (n, seed) always gives
+the same rows.
+"""
+import numpy as np
+import pandas as pd
+
+START, END = pd.Timestamp("2021-01-01"), pd.Timestamp("2025-12-31")
+
+ACCOUNTS = [  # name, type, starting balance, share of transactions
+    ("Checking", "bank", 2500.0, 0.45), ("Credit Card", "card", 0.0, 0.30), ("Cash", "wallet", 200.0, 0.10),
+    ("Joint Checking", "bank", 1000.0, 0.07), ("Savings", "bank", 10000.0, 0.06), ("Travel Card", "card", 0.0, 0.02),
+]
+EXPENSES = [  # name, typical amount
+    ("Groceries", 60), ("Restaurants", 35), ("Transport", 20), ("Shopping", 80), ("Utilities", 120),
+    ("Coffee", 5), ("Entertainment", 40), ("Health", 90), ("Rent", 1600), ("Travel", 400),
+    ("Gifts", 50), ("Education", 200), ("Insurance", 150), ("Pets", 45), ("Other Activities", 30),
+]
+INCOME = [("Salary", 3200), ("Freelance", 600), ("Interest", 15)]
+SAVINGS = [("Emergency Fund", 250), ("Retirement", 500)]
+NOTES = ["", "", "", "weekly shop", "with friends", "monthly", "online order", "refund pending", "card payment",
+         "split bill", "subscription", "cash", "gift for mom", "work trip", "annual fee"]
+
+def accounts() -> pd.DataFrame:
+    return pd.DataFrame({"id": range(1, len(ACCOUNTS) + 1), "name": [a[0] for a in ACCOUNTS],
+                         "type": [a[1] for a in ACCOUNTS], "starting_balance": [a[2] for a in ACCOUNTS],
+                         "created_at": START.isoformat()})
+
+def categories() -> pd.DataFrame:
+    rows = [(n, k) for k, group in (("expense", EXPENSES), ("income", INCOME), ("savings", SAVINGS)) for n, _ in group]
+    return pd.DataFrame({"id": range(1, len(rows) + 1), "name": [r[0] for r in rows], "kind": [r[1] for r in rows],
+                         "is_default": 0, "created_at": START.isoformat()})
+
+def _zipf(k: int, s: float = 1.1) -> np.ndarray:
+    w = 1.0 / np.arange(1, k + 1) ** s
+    return w / w.sum()
+
+def transactions(n: int, seed: int = 0) -> pd.DataFrame:
+    """n transactions (without ids) referring to accounts() and categories() by id."""
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(3, size=n, p=[0.875, 0.08, 0.045])  # expense, income, savings
+    groups = [EXPENSES, INCOME, SAVINGS]
+    offsets = np.cumsum([0] + [len(g) for g in groups])[:-1]
+    pick = np.zeros(n, dtype=np.int64)
+    typical = np.zeros(n)
+    for k, group in enumerate(groups):
+        rows = kinds == k
+        idx = rng.choice(len(group), size=int(rows.sum()), p=_zipf(len(group)))
+        pick[rows] = offsets[k] + idx
+        typical[rows] = np.array([g[1] for g in group], dtype=float)[idx]
+    days = (END - START).days + 1
+    return pd.DataFrame({
+        "account_id": rng.choice(len(ACCOUNTS), size=n, p=[a[3] for a in ACCOUNTS]) + 1,
+        "category_id": pick + 1,
+        "amount": np.round(typical * rng.lognormal(0.0, 0.5, size=n), 2),
+        "type": np.array(["expense", "income", "savings"])[kinds],
+        "date": START + pd.to_timedelta(np.sort(rng.integers(0, days, size=n)), unit="D"),
+        "note": np.array(NOTES, dtype=object)[rng.integers(0, len(NOTES), size=n)],
+    })
+
+def import_csv(n: int, seed: int = 1) -> bytes:
+    """The same kind of rows as an import file (account/category by name), for import_transactions_csv."""
+    tx = transactions(n, seed)
+    names = categories()["name"].to_numpy()
+    out = pd.DataFrame({"date": tx["date"].dt.strftime("%Y-%m-%d"),
+                        "account": np.array([a[0] for a in ACCOUNTS])[tx["account_id"] - 1],
+                        "category": names[tx["category_id"] - 1], "type": tx["type"],
+                        "amount": tx["amount"], "note": tx["note"]})
+    return out.to_csv(index=False).encode("utf-8")
+
+def populate(n: int, seed: int = 0):
+    """Fill the configured storage (see core.config) with a ledger of n transactions."""
+    from core import storage as S
+    S.save_accounts(accounts())
+    S.save_categories(categories())
+    tx = transactions(n, seed)
+    for lo in range(0, n, 1_000_000):  # bounded write batches
+        S.add_transactions(tx.iloc[lo:lo + 1_000_000])
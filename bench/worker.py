@@ -0,0 +1,68 @@
+"""One benchmark process: `generate N SEED` fills ./data, `measure REPEAT` times
+the operations against it and prints the results as JSON.
+
+Run by bench.run with the ledger's directory as the working directory.
+"""
+import io, json, sys, time, tracemalloc
+from datetime import date
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+IMPORT_ROWS = 10_000
+
+def _operations(calls: int):
+    from core import storage as S, logic as L, utils as U
+    from . import synth
+    start, end = L.get_month_bounds(2025, 6)
+    # a fresh file per call (seeds 1, 2, ...): re-importing one would only time skipped duplicates
+    uploads = iter([synth.import_csv(IMPORT_ROWS, seed) for seed in range(1, calls + 1)])
+    # reads first: every write below moves the ledger to a new version
+    return [
+        ("load_transactions", S.load_transactions),
+        ("totals_for_period", lambda: L.totals_for_period(start, end)),
+        ("expenses_by_category", lambda: L.expenses_by_category(start, end)),
+        ("monthly_cashflow", lambda: L.monthly_cashflow(2025, 12, months=12)),
+        ("current_savings", L.current_savings),
+        ("dashboard", lambda: L.Dashboard(2025, 12, months=12)),  # the scan, not the memo
+        ("add_transaction", lambda: S.add_transaction(1, 1, 12.5, "expense", date(2025, 12, 31), "bench")),
+        ("import_transactions_csv", lambda: U.import_transactions_csv(io.BytesIO(next(uploads)))),
+    ]
+
+def _timed(fn) -> float:
+    t = time.perf_counter()
+    fn()
+    return time.perf_counter() - t
+
+def _max_rss_mb() -> float:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)  # bytes on macOS, KiB elsewhere
+
+def measure(repeat: int) -> dict:
+    """first_s is the first (cold) call, best_s the fastest of `repeat` more;
+    peak_mb is the most memory allocated during one further (warm) call, and
+    max_rss_mb the process's high-water mark so far, which includes cold calls."""
+    out = {}
+    for name, fn in _operations(repeat + 2):
+        first = _timed(fn)
+        best = min(_timed(fn) for _ in range(repeat))
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out[name] = {"first_s": round(first, 6), "best_s": round(best, 6), "peak_mb": round(peak / 2**20, 2),
+                     "max_rss_mb": _max_rss_mb()}
+    return out
+
+if __name__ == "__main__":
+    sys.path.insert(0, ".")
+    if sys.argv[1] == "generate":
+        from . import synth
+        t = time.perf_counter()
+        synth.populate(int(sys.argv[2]), int(sys.argv[3]))
+        print(json.dumps({"generate_s": round(time.perf_counter() - t, 3)}))
+    else:
+        print(json.dumps(measure(int(sys.argv[2]))))
@@ -0,0 +1,117 @@
+"""flowfox from the command line, without Streamlit.
+
+    python -m core report --month 2025-09 --format json
+    python -m core import statement.csv
+    python -m core compact
+    python -m core backup flowfox.zip
+
+Only the standard library is imported up front; each command imports the
+parts of core it needs (pandas and the storage backend), after --data-dir
+has been applied, so a report costs one pandas import plus the rollup reads.
+"""
+import argparse, json, sys
+from datetime import date
+from . import config
+
+def _month(text: str):
+    try:
+        year, month = (int(p) for p in text.split("-"))
+        date(year, month, 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError("month must look like YYYY-MM")
+    return year, month
+
+def _records(df) -> list:
+    """Rows as dicts, with None (JSON null) for missing values such as a deleted category's name."""
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+def report(args) -> int:
+    from . import logic as L
+    year, month = args.month
+    start, end = L.get_month_bounds(year, month)
+    income, expenses, net = L.totals_for_period(start, end)
+    out = {
+        "month": f"{year:04d}-{month:02d}",
+        "income": income,
+        "expenses": expenses,
+        "net": net,
+        "savings": L.current_savings(),
+        "expenses_by_category": _records(L.expenses_by_category(start, end)),
+        "trend": _records(L.monthly_cashflow(year, month, args.months)),
+    }
+    if args.format == "json":
+        json.dump(out, sys.stdout, indent=2, default=float)
+        print()
+    elif args.format == "csv":
+        print("metric,value")
+        for key in ("income", "expenses", "net", "savings"):
+            print(f"{key},{out[key]:.2f}")
+    else:
+        print(f"flowfox report for {out['month']}")
+        for key in ("income", "expenses", "net", "savings"):
+            print(f"  {key.capitalize():<10}{out[key]:>14,.2f}")
+        if out["expenses_by_category"]:
+            print("Expenses by category")
+            for row in out["expenses_by_category"]:
+                print(f"  {row['category'] or '(no category)':<20}{row['amount']:>14,.2f}")
+        print(f"Last {args.months} months")
+        for row in out["trend"]:
+            print(f"  {row['period']:<10}{row['income']:>14,.2f}{row['expenses']:>14,.2f}{row['net']:>14,.2f}")
+    return 0
+
+def import_csv(args) -> int:
+    from .utils import ensure_seed_data, import_transactions_csv
+    ensure_seed_data()
+    try:
+        with open(args.file, "rb") as f:
+            result = import_transactions_csv(f, chunksize=args.chunksize)
+    except (OSError, ValueError) as e:
+        print(f"import failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {result['inserted']:,} transactions ({result['skipped']:,} already in the ledger).")
+    return 0
+
+def compact(args) -> int:
+    from . import storage as S
+    from .schema import SCHEMAS
+    for kind in SCHEMAS:
+        S.compact(kind)
+    print(f"Compacted {', '.join(SCHEMAS)} in {config.DATA_DIR}.")
+    return 0
+
+def backup(args) -> int:
+    from .backup import write_backup
+    manifest = write_backup(args.out)
+    rows = sum(t["rows"] for t in manifest["tables"].values())
+    print(f"Wrote {rows:,} rows from {len(manifest['tables'])} tables to {args.out}.")
+    return 0
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m core", description=__doc__.split("\n")[0])
+    p.add_argument("--data-dir", default=config.DATA_DIR, help=f"ledger directory (default {config.DATA_DIR}, or FLOWFOX_DATA_DIR)")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    r = sub.add_parser("report", help="income, expenses, net and savings for a month")
+    r.add_argument("--month", type=_month, default=(date.today().year, date.today().month), help="YYYY-MM (default this month)")
+    r.add_argument("--months", type=int, default=6, help="months in the trend, ending with --month (default 6)")
+    r.add_argument("--format", choices=["text", "json", "csv"], default="text")
+    r.set_defaults(run=report)
+
+    i = sub.add_parser("import", help="import a CSV export, skipping rows already in the ledger")
+    i.add_argument("file")
+    i.add_argument("--chunksize", type=int, default=10_000)
+    i.set_defaults(run=import_csv)
+
+    c = sub.add_parser("compact", help="fold pending appends into each table's main storage")
+    c.set_defaults(run=compact)
+
+    b = sub.add_parser("backup", help="write a zipped backup of every table")
+    b.add_argument("out")
+    b.set_defaults(run=backup)
+
+    args = p.parse_args(argv)
+    config.DATA_DIR = args.data_dir  # the ledger every command works on (see core.scope)
+    return args.run(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+"""Storage backends.
+
+Each backend module exposes the same primitives, which core.storage builds
+its public API on:
+
+    load(kind), write(kind, df), append(kind, df), upsert(kind, df, keys),
+    apply_changes(kind, inserts, updates, deletes), max_id(kind),
+    version(kind), compact(kind), between(start, end, columns),
+    grouped_sum(start, end, by), sorted_by_date(), chunks(kind, chunksize)
+
+version(kind) returns a token that changes whenever the table does.
+
+Frames going in are already in schema column order; frames coming out are
+normalized (see core.schema) and the caller's own: never the cached ones.
+"""
+import importlib
+
+BACKENDS = {"csv": "files", "sqlite": "sqlite"}
+
+def get(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown storage backend {name!r}; expected one of: {', '.join(BACKENDS)}")
+    return importlib.import_module(f".{BACKENDS[name]}", __name__)
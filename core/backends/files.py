@@ -0,0 +1,382 @@
+"""Table files under the ledger's data directory: CSV, or Parquet / Feather (Arrow IPC) with
+FLOWFOX_FORMAT, which store real dtypes and let readers load only the
+columns they need. Files left in another format are converted on first use;
+CSV stays the interchange format for export and import either way.
+
+Small tables are one file each. Transactions are partitioned by month into
+<data dir>/transactions/YYYY-MM.<ext> (plus undated.<ext> for rows without a valid
+date): range reads open only the overlapping partitions, and writes touch
+only the partitions whose rows changed. Each partition is kept in memory
+sorted by (date, id), so the table in date order is their concatenation and
+a write re-sorts only the months it touched. A ledger still in the old single
+transactions.csv layout is split into partitions on first access.
+"""
+import os, io
+import pandas as pd
+from .. import config, parallel, perf, scope
+from ..schema import SCHEMAS, concat, normalize, merge_changes, month_labels
+from ..writer import exclusive
+
+EXTS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+if config.FORMAT not in EXTS:
+    raise ValueError(f"Unknown FLOWFOX_FORMAT {config.FORMAT!r}; expected one of: {', '.join(EXTS)}")
+EXT = EXTS[config.FORMAT]
+if EXT != ".csv":
+    try:
+        import pyarrow.feather  # noqa: F401
+    except ImportError as e:
+        raise ImportError(f"FLOWFOX_FORMAT={config.FORMAT} needs pyarrow (pip install pyarrow)") from e
+
+# File of each table in the current ledger's directory (created on first write)
+FILES = {
+    "accounts": "accounts" + EXT,
+    "categories": "categories" + EXT,
+    "transactions": "transactions.csv",  # legacy single-file layout
+    "budgets": "budgets" + EXT,
+}
+
+PARTITIONED = {"transactions"}
+UNDATED = "undated"
+
+_CACHE = scope.State("files")  # name -> (file identity, normalized frame), per ledger
+
+# Appends to single-file tables go to a headerless sidecar journal, folded back
+# into the base file by compact() once the journal outgrows both this and a
+# quarter of the base file, so compaction stays amortized O(1) per row.
+JOURNAL_COMPACT_BYTES = 1 << 20
+
+def _read_complete(path: str, kind: str, header: bool = True, columns=None) -> pd.DataFrame:
+    """Read an append-only CSV, ignoring a torn last line from a crash mid-append."""
+    data = b""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            data = f.read()
+    data = data[:data.rfind(b"\n") + 1]
+    dates = ["date"] if kind == "transactions" and (columns is None or "date" in columns) else False
+    if not data or (header and data.count(b"\n") == 1):
+        df = pd.DataFrame(columns=columns or SCHEMAS[kind])
+    elif header:
+        df = pd.read_csv(io.BytesIO(data), parse_dates=dates, usecols=columns)
+    else:
+        df = pd.read_csv(io.BytesIO(data), names=SCHEMAS[kind], header=None, parse_dates=dates, usecols=columns)
+    perf.io(_label(path), len(df), len(data))
+    return df
+
+def _dir() -> str:
+    return scope.current().path
+
+def _file(kind: str) -> str:
+    return os.path.join(_dir(), FILES[kind])
+
+def _label(path: str) -> str:
+    return "read " + os.path.relpath(path, _dir())
+
+def _read_file(path: str, kind: str, columns=None) -> pd.DataFrame:
+    ext = os.path.splitext(path)[1]
+    if ext == ".parquet":
+        df = pd.read_parquet(path, columns=columns)
+    elif ext == ".feather":
+        from pyarrow import feather
+        # uncompressed Arrow IPC, so the columns are mapped rather than read
+        df = feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    else:
+        return _read_complete(path, kind, columns=columns)
+    perf.io(_label(path), len(df), os.path.getsize(path))
+    return df
+
+def _write_file(df: pd.DataFrame, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    ext = os.path.splitext(path)[1]
+    if ext == ".parquet":
+        df.to_parquet(tmp, index=False)
+    elif ext == ".feather":
+        from pyarrow import feather
+        feather.write_feather(df.reset_index(drop=True), tmp, compression="uncompressed")
+    else:
+        df.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+
+def _adopt(path: str, kind: str):
+    """Convert a table file still in another format to the configured one."""
+    stem = os.path.splitext(path)[0]
+    for ext in EXTS.values():
+        old = stem + ext
+        if ext != EXT and os.path.exists(old):
+            with exclusive():
+                if os.path.exists(old):  # recheck: another writer may have won
+                    if not os.path.exists(path):
+                        _write_file(normalize(kind, _read_file(old, kind)), path)
+                    os.remove(old)  # already converted if `path` exists (e.g. a crash before this)
+
+def _read(kind: str) -> pd.DataFrame:
+    path = _file(kind)
+    if not os.path.exists(path):
+        _adopt(path, kind)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=SCHEMAS[kind])  # created on the first write, not on reads
+    return _read_file(path, kind)
+
+def _append_rows(path: str, df: pd.DataFrame, header: bool):
+    """Durably append rows to a CSV, first dropping any torn last line."""
+    if os.path.exists(path):
+        with open(path, "rb+") as f:
+            if f.seek(0, 2):
+                f.seek(-1, 2)
+                if f.read(1) != b"\n":
+                    f.seek(0)
+                    data = f.read()
+                    f.truncate(data.rfind(b"\n") + 1)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        df.to_csv(f, header=header, index=False)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _journal_path(kind: str) -> str:
+    return os.path.join(_dir(), kind + ".journal.csv")
+
+def _identity(path: str):
+    if not os.path.exists(path): return None
+    st = os.stat(path)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+def _cached(name: str, key, build):
+    hit = _CACHE.get(name)
+    if hit is None or hit[0] != key:
+        hit = _CACHE[name] = (key, build())
+    return hit[1]
+
+def _base(kind: str):
+    key = _identity(_file(kind))
+    return key, _cached(kind, key, lambda: normalize(kind, _read(kind)))
+
+def _max(df: pd.DataFrame) -> int:
+    return 0 if df.empty else int(pd.to_numeric(df["id"]).max())
+
+def _empty(kind: str) -> pd.DataFrame:
+    return normalize(kind, pd.DataFrame(columns=SCHEMAS[kind]))
+
+# ---------- single-file tables ----------
+def _load_single(kind: str) -> pd.DataFrame:
+    key, base = _base(kind)
+    jkey = _identity(_journal_path(kind))
+    if jkey is None:
+        return base
+    def merge():
+        j = normalize(kind, _read_complete(_journal_path(kind), kind, header=False))
+        j = j[~j["id"].isin(base["id"])]  # rows already folded in by an interrupted compact()
+        return concat(kind, [base, j]) if not j.empty else base
+    return _cached(kind + ".journal", (key, jkey), merge)
+
+def _write_single(kind: str, df: pd.DataFrame):
+    _write_file(df, _file(kind))
+    # the frame written is the full table, journal rows included
+    if os.path.exists(_journal_path(kind)):
+        os.remove(_journal_path(kind))
+    _CACHE.pop(kind, None)
+
+def _max_id_single(kind: str) -> int:
+    key, base = _base(kind)
+    path = _journal_path(kind)
+    top = _cached(kind + ".max_id", key, lambda: _max(base))
+    return max(top, _cached(kind + ".journal_max_id", _identity(path),
+                            lambda: _max(_read_complete(path, kind, header=False))))
+
+def _append_single(kind: str, df: pd.DataFrame):
+    path = _journal_path(kind)
+    top = _max_id_single(kind)
+    _append_rows(path, df, header=False)
+    # we know the journal's new max id; skip re-parsing it on the next append
+    _CACHE[kind + ".journal_max_id"] = (_identity(path), max(top, _max(df)))
+    base = _file(kind)
+    if os.path.getsize(path) >= max(JOURNAL_COMPACT_BYTES, (os.path.getsize(base) if os.path.exists(base) else 0) // 4):
+        _write_single(kind, _load_single(kind))
+
+# ---------- month-partitioned tables ----------
+def _part_dir(kind: str) -> str:
+    return os.path.join(_dir(), kind)
+
+def _part_path(kind: str, key: str) -> str:
+    return os.path.join(_part_dir(kind), key + EXT)
+
+def _part_keys(dates: pd.Series) -> pd.Series:
+    """Partition key (YYYY-MM, or UNDATED) for each date."""
+    return month_labels(dates).fillna(UNDATED)
+
+def _list_parts(kind: str) -> dict:
+    d = _part_dir(kind)
+    if not os.path.isdir(d):
+        return {}
+    files = [os.path.splitext(n) for n in os.listdir(d)]
+    if any(ext != EXT and ext in EXTS.values() for _, ext in files):
+        # partitions left in another format: convert them, once (the listing has no others after this)
+        for key in {stem for stem, ext in files if ext != EXT and ext in EXTS.values()}:
+            _adopt(_part_path(kind, key), kind)
+        files = [os.path.splitext(n) for n in os.listdir(d)]
+    return {key: os.path.join(d, key + EXT) for key in sorted({stem for stem, ext in files if ext == EXT})}
+
+def _partitions(kind: str) -> dict:
+    legacy = lambda: os.path.exists(_file(kind)) or os.path.exists(_journal_path(kind))
+    if legacy():
+        with exclusive():
+            if legacy():
+                # still in the single-file layout: split it up once
+                _write_partitions(kind, _load_single(kind))
+                for path in (_file(kind), _journal_path(kind)):
+                    if os.path.exists(path):
+                        os.remove(path)
+    return _list_parts(kind)
+
+def _load_part(kind: str, path: str, columns=None) -> pd.DataFrame:
+    ident = _identity(path)
+    hit = _CACHE.get(path)
+    if hit is not None and hit[0] == ident:
+        return hit[1] if columns is None else hit[1][columns]
+    if columns is None:
+        return _cached(path, ident, lambda: _by_date(normalize(kind, _read_file(path, kind))))
+    # column projection: only these columns are parsed (or mapped)
+    return _cached(f"{path}|{','.join(columns)}", ident, lambda: normalize(kind, _read_file(path, kind, columns)))
+
+def _by_date(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(["date", "id"], ignore_index=True) if "date" in df.columns else df
+
+def _part_max_id(kind: str, path: str) -> int:
+    return _cached(path + ".max_id", _identity(path), lambda: _max(_load_part(kind, path)))
+
+def _concat(kind: str, frames: list) -> pd.DataFrame:
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return _empty(kind)
+    return frames[0] if len(frames) == 1 else concat(kind, frames)
+
+def _load_partitioned(kind: str) -> pd.DataFrame:
+    # only the partitions are cached: a cached concatenation would hold the table twice
+    return _concat(kind, [_load_part(kind, p) for p in _partitions(kind).values()])
+
+def _write_partitions(kind: str, df: pd.DataFrame):
+    df = df.assign(date=pd.to_datetime(df["date"], errors="coerce"))
+    keys = _part_keys(df["date"])
+    current = _list_parts(kind)
+    os.makedirs(_part_dir(kind), exist_ok=True)
+    for key, part in df.groupby(keys.to_numpy(), sort=False):
+        path = _part_path(kind, key)
+        if key in current and _load_part(kind, path).equals(_by_date(normalize(kind, part.copy()))):
+            continue  # unchanged partition
+        _write_file(part, path)
+    for key in set(current) - set(keys):
+        os.remove(current[key])
+
+def _append_partitioned(kind: str, df: pd.DataFrame):
+    df = df.assign(date=pd.to_datetime(df["date"], errors="coerce"))
+    _partitions(kind)
+    os.makedirs(_part_dir(kind), exist_ok=True)
+    for key, part in df.groupby(_part_keys(df["date"]).to_numpy(), sort=False):
+        path = _part_path(kind, key)
+        top = _part_max_id(kind, path) if os.path.exists(path) else 0
+        if EXT == ".csv":
+            _append_rows(path, part, header=not os.path.exists(path))
+        else:
+            # columnar files can't be appended to; rewrite just this month
+            cur = _load_part(kind, path) if os.path.exists(path) else _empty(kind)
+            _write_file(_concat(kind, [cur, normalize(kind, part)]), path)
+        _CACHE[path + ".max_id"] = (_identity(path), max(top, _max(part)))
+
+# ---------- backend primitives ----------
+def version(kind: str):
+    if kind in PARTITIONED:
+        return tuple((k, _identity(p)) for k, p in _partitions(kind).items())
+    return (_identity(_file(kind)), _identity(_journal_path(kind)))
+
+def load(kind: str) -> pd.DataFrame:
+    """Parse + normalize each file once per on-disk version; hand out copies, so
+    a caller's edits never reach the cached frames (Arrow strings are shared,
+    being immutable, which keeps this a fraction of the parse)."""
+    if kind in PARTITIONED:
+        return _load_partitioned(kind).copy()
+    return _load_single(kind).copy()
+
+def write(kind: str, df: pd.DataFrame):
+    if kind in PARTITIONED:
+        _partitions(kind)
+        _write_partitions(kind, df)
+    else:
+        _write_single(kind, df)
+
+def apply_changes(kind: str, inserts, updates, deletes):
+    """Apply a change set (see schema.merge_changes), rewriting only the partitions it touches."""
+    if kind not in PARTITIONED:
+        _write_single(kind, merge_changes(kind, _load_single(kind), inserts, updates, deletes))
+        return
+    parts = _partitions(kind)
+    cur = _load_partitioned(kind)
+    ids = list(deletes) + (list(updates["id"]) if updates is not None else [])
+    keys = set(_part_keys(cur.loc[cur["id"].isin(ids), "date"]))  # where the changed rows are now
+    for new in (inserts, updates):
+        if new is not None and "date" in new.columns:
+            keys |= set(_part_keys(pd.to_datetime(new["date"], errors="coerce")))  # and where they move to
+    touched = _concat(kind, [_load_part(kind, parts[k]) for k in sorted(keys) if k in parts])
+    touched = merge_changes(kind, touched, inserts, updates, deletes)
+    by_key = dict(tuple(touched.groupby(_part_keys(touched["date"]).to_numpy(), sort=False)))
+    os.makedirs(_part_dir(kind), exist_ok=True)
+    for key in keys:
+        if key in by_key:
+            _write_file(by_key[key].sort_values("id"), _part_path(kind, key))
+        elif key in parts:
+            os.remove(parts[key])
+
+def max_id(kind: str) -> int:
+    if kind in PARTITIONED:
+        return max((_part_max_id(kind, p) for p in _partitions(kind).values()), default=0)
+    return _max_id_single(kind)
+
+def append(kind: str, df: pd.DataFrame):
+    """Durably append rows; cost is independent of the table size."""
+    if kind in PARTITIONED:
+        _append_partitioned(kind, df)
+    else:
+        _append_single(kind, df)
+
+def compact(kind: str):
+    """Fold any append journal (or legacy single file) into the table's main files."""
+    if kind in PARTITIONED:
+        _partitions(kind)
+    elif os.path.exists(_journal_path(kind)):
+        _write_single(kind, _load_single(kind))
+
+def upsert(kind: str, df: pd.DataFrame, keys: list):
+    cur = load(kind)
+    new = df.merge(cur[keys + ["id"]], on=keys, how="left", suffixes=("", "_old"))
+    new["id"] = new["id_old"].fillna(new["id"]).astype(int)  # replaced rows keep their id
+    keep = cur.merge(df[keys], on=keys, how="left", indicator=True)["_merge"].eq("left_only").to_numpy()
+    write(kind, pd.concat([cur[keep], new[SCHEMAS[kind]]], ignore_index=True).sort_values("id"))
+
+# Pushdown queries. The CSV files have no indexes, but only the month
+# partitions overlapping the range are read.
+def between(start, end, columns=None) -> pd.DataFrame:
+    s, e = pd.to_datetime(start), pd.to_datetime(end)
+    want = set(pd.period_range(s, e, freq="M").strftime("%Y-%m"))
+    cols = None if columns is None else [c for c in SCHEMAS["transactions"] if c in set(columns) | {"date"}]
+    tx = _concat("transactions", [_load_part("transactions", p, cols)
+                                  for k, p in _partitions("transactions").items() if k in want])
+    tx = tx[(tx["date"] >= s) & (tx["date"] <= e)]
+    return tx if columns is None else tx[list(columns)]
+
+def grouped_sum(start, end, by) -> pd.DataFrame:
+    by = list(by)
+    tx = load("transactions") if start is None else between(start, end, by + ["amount"])
+    return parallel.grouped_sum(tx, by)
+
+def chunks(kind: str, chunksize: int):
+    # a partition (or small table) at a time, copied one slice at a time
+    paths = _partitions(kind).values() if kind in PARTITIONED else [None]
+    for path in paths:
+        df = _load_part(kind, path) if path else _load_single(kind)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize].copy()
+
+def sorted_by_date() -> pd.DataFrame:
+    # partitions are in month order (undated last) and each is cached sorted
+    frames = [_load_part("transactions", p) for p in _partitions("transactions").values()]
+    out = _concat("transactions", frames)
+    return out.copy() if any(out is f for f in frames) else out  # never hand out a cached frame
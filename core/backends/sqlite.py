@@ -0,0 +1,170 @@
+"""SQLite database at <data dir>/flowfox.db with indexed transactions, one per ledger.
+
+Enable with FLOWFOX_BACKEND=sqlite. Existing CSV data can be copied over once
+with `python -m core.backends.sqlite` (see migrate_from_csv).
+"""
+import os, sqlite3, threading
+import pandas as pd
+from .. import perf, scope
+from ..schema import SCHEMAS, normalize
+
+DB_NAME = "flowfox.db"
+
+DDL = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY, name TEXT, type TEXT, starting_balance REAL, created_at TEXT);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY, name TEXT, kind TEXT, is_default INTEGER, created_at TEXT);
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY, account_id INTEGER, category_id INTEGER, amount REAL,
+    type TEXT, date TEXT, note TEXT, created_at TEXT);
+CREATE INDEX IF NOT EXISTS ix_transactions_date ON transactions(date);
+CREATE INDEX IF NOT EXISTS ix_transactions_category ON transactions(category_id);
+CREATE INDEX IF NOT EXISTS ix_transactions_account ON transactions(account_id);
+CREATE TABLE IF NOT EXISTS budgets (
+    id INTEGER PRIMARY KEY, category_id INTEGER, period TEXT, amount REAL,
+    UNIQUE (category_id, period));
+CREATE TABLE IF NOT EXISTS versions (kind TEXT PRIMARY KEY, version INTEGER NOT NULL);
+"""
+
+# Per ledger: kind -> (table version, normalized frame), and "connections" ->
+# a threading.local, since sqlite3 connections are per thread
+_CACHE = scope.State("sqlite")
+
+def _db_path() -> str:
+    return os.path.join(scope.current().path, DB_NAME)
+
+def _conn(create: bool = False) -> sqlite3.Connection:
+    """This thread's connection to the ledger's database; a throwaway empty
+    in-memory one while the database doesn't exist, unless `create` (writes)."""
+    if not create and not os.path.exists(_db_path()):
+        con = sqlite3.connect(":memory:")
+        con.executescript(DDL)
+        return con
+    local = _CACHE.get("connections")
+    if local is None:
+        local = _CACHE["connections"] = threading.local()
+    con = getattr(local, "con", None)
+    if con is None:
+        os.makedirs(scope.current().path, exist_ok=True)
+        con = local.con = sqlite3.connect(_db_path())
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript(DDL)
+    return con
+
+def version(kind: str) -> int:
+    row = _conn().execute("SELECT version FROM versions WHERE kind = ?", (kind,)).fetchone()
+    return row[0] if row else 0
+
+def _bump(con: sqlite3.Connection, kind: str):
+    con.execute("INSERT INTO versions (kind, version) VALUES (?, 1) "
+                "ON CONFLICT(kind) DO UPDATE SET version = version + 1", (kind,))
+
+def _records(kind: str, df: pd.DataFrame, columns=None) -> list:
+    df = df[columns or SCHEMAS[kind]]
+    if "date" in df.columns:
+        df = df.assign(date=pd.to_datetime(df["date"], errors="coerce").dt.strftime("%Y-%m-%d"))
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+def _insert_sql(kind: str) -> str:
+    cols = SCHEMAS[kind]
+    return f"INSERT INTO {kind} ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))})"
+
+def _query(sql: str, params=()) -> pd.DataFrame:
+    df = pd.read_sql_query(sql, _conn(), params=params)
+    perf.io("sqlite query", len(df), int(df.memory_usage(index=False).sum()))
+    return df
+
+def load(kind: str) -> pd.DataFrame:
+    v = version(kind)
+    hit = _CACHE.get(kind)
+    if hit is None or hit[0] != v:
+        hit = _CACHE[kind] = (v, normalize(kind, _query(f"SELECT {', '.join(SCHEMAS[kind])} FROM {kind} ORDER BY id")))
+    return hit[1].copy()  # a copy: callers may edit it (see files.load)
+
+def write(kind: str, df: pd.DataFrame):
+    con = _conn(create=True)
+    with con:
+        con.execute(f"DELETE FROM {kind}")
+        con.executemany(_insert_sql(kind), _records(kind, df))
+        _bump(con, kind)
+
+def append(kind: str, df: pd.DataFrame):
+    con = _conn(create=True)
+    with con:
+        con.executemany(_insert_sql(kind), _records(kind, df))
+        _bump(con, kind)
+
+def upsert(kind: str, df: pd.DataFrame, keys: list):
+    cols = SCHEMAS[kind]
+    updates = ", ".join(f"{c} = excluded.{c}" for c in cols if c not in keys and c != "id")
+    sql = f"{_insert_sql(kind)} ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}"
+    con = _conn(create=True)
+    with con:
+        con.executemany(sql, _records(kind, df))
+        _bump(con, kind)
+
+def apply_changes(kind: str, inserts, updates, deletes):
+    """Apply a change set with targeted INSERT/UPDATE/DELETE statements in one transaction."""
+    con = _conn(create=True)
+    with con:
+        if len(deletes):
+            con.executemany(f"DELETE FROM {kind} WHERE id = ?", [(int(i),) for i in deletes])
+        if updates is not None and len(updates):
+            cols = [c for c in updates.columns if c != "id"]
+            sql = f"UPDATE {kind} SET {', '.join(c + ' = ?' for c in cols)} WHERE id = ?"
+            con.executemany(sql, _records(kind, updates, cols + ["id"]))
+        if inserts is not None and len(inserts):
+            con.executemany(_insert_sql(kind), _records(kind, inserts))
+        _bump(con, kind)
+
+def max_id(kind: str) -> int:
+    return _conn().execute(f"SELECT COALESCE(MAX(id), 0) FROM {kind}").fetchone()[0]
+
+def compact(kind: str):
+    _conn().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# Pushdown queries, answered from the indexes without loading the table.
+def _columns(columns) -> list:
+    cols = list(columns or SCHEMAS["transactions"])
+    unknown = set(cols) - set(SCHEMAS["transactions"])
+    if unknown:
+        raise ValueError(f"Unknown transaction columns: {', '.join(sorted(unknown))}")
+    return cols
+
+def _range(start, end):
+    if start is None: return "", ()
+    return " WHERE date BETWEEN ? AND ?", (pd.Timestamp(start).strftime("%Y-%m-%d"), pd.Timestamp(end).strftime("%Y-%m-%d"))
+
+def between(start, end, columns=None) -> pd.DataFrame:
+    where, params = _range(start, end)
+    return normalize("transactions", _query(f"SELECT {', '.join(_columns(columns))} FROM transactions{where} ORDER BY id", params))
+
+def chunks(kind: str, chunksize: int):
+    for chunk in pd.read_sql_query(f"SELECT {', '.join(SCHEMAS[kind])} FROM {kind} ORDER BY id", _conn(), chunksize=chunksize):
+        perf.io("sqlite query", len(chunk), int(chunk.memory_usage(index=False).sum()))
+        yield normalize(kind, chunk)
+
+def sorted_by_date() -> pd.DataFrame:
+    return normalize("transactions", _query(
+        f"SELECT {', '.join(SCHEMAS['transactions'])} FROM transactions ORDER BY date IS NULL, date, id"))
+
+def grouped_sum(start, end, by) -> pd.DataFrame:
+    by = ", ".join(_columns(by))
+    where, params = _range(start, end)
+    return normalize("transactions", _query(
+        f"SELECT {by}, SUM(amount) AS amount, COUNT(*) AS count FROM transactions{where} GROUP BY {by}", params))
+
+def migrate_from_csv() -> dict:
+    """Copy every table from the ledger's CSV files into its database, replacing its contents."""
+    from . import files
+    counts = {}
+    for kind in SCHEMAS:
+        df = files.load(kind)
+        write(kind, df)
+        counts[kind] = len(df)
+    return counts
+
+if __name__ == "__main__":
+    for kind, n in migrate_from_csv().items():
+        print(f"{kind}: {n} rows -> {_db_path()}")
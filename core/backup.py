@@ -0,0 +1,86 @@
+"""Full backups: one zip archive of every table plus a manifest.
+
+The archive holds <table>.csv for each table and manifest.json with the schema
+version, each table's row count and the SHA-256 of its CSV. Both directions
+stream: write_backup() reads each table a partition (or a sqlite cursor batch)
+at a time and serializes CHUNK_ROWS rows at a time straight into the
+compressed member, and restore_backup() checks every checksum first, then
+reads each member back CHUNK_ROWS rows at a time into core.storage. Memory
+stays at about one partition or chunk whatever the ledger size.
+"""
+import hashlib, itertools, json, zipfile
+from datetime import datetime
+import pandas as pd
+from . import storage as S
+from .schema import SCHEMAS, SCHEMA_VERSION
+from .writer import exclusive
+
+TABLES = list(SCHEMAS)
+MANIFEST = "manifest.json"
+CHUNK_ROWS = 50_000
+
+def write_backup(out, chunksize: int = CHUNK_ROWS) -> dict:
+    """Write the archive to `out` (a path or a writable binary file); returns the manifest."""
+    manifest = {"schema_version": SCHEMA_VERSION, "created": datetime.now().isoformat(timespec="seconds"), "tables": {}}
+    with zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for kind in TABLES:
+            digest, rows = hashlib.sha256(), 0
+            with zf.open(f"{kind}.csv", "w", force_zip64=True) as member:
+                # the header on its own first, so an empty table still gets one
+                chunks = itertools.chain([pd.DataFrame(columns=SCHEMAS[kind])], S.table_chunks(kind, chunksize))
+                for i, chunk in enumerate(chunks):
+                    data = chunk.to_csv(index=False, header=i == 0).encode("utf-8")
+                    digest.update(data)
+                    member.write(data)
+                    rows += len(chunk)
+            manifest["tables"][kind] = {"file": f"{kind}.csv", "rows": rows, "sha256": digest.hexdigest()}
+        zf.writestr(MANIFEST, json.dumps(manifest, indent=2))
+    return manifest
+
+def read_manifest(src) -> dict:
+    """The manifest of the archive at `src` (a path or a seekable binary file)."""
+    with zipfile.ZipFile(src) as zf:
+        return _manifest(zf)
+
+def _manifest(zf: zipfile.ZipFile) -> dict:
+    try:
+        manifest = json.loads(zf.read(MANIFEST))
+    except KeyError:
+        raise ValueError("Not a FlowFox backup: the archive has no manifest.json.") from None
+    if manifest.get("schema_version", 0) > SCHEMA_VERSION:
+        raise ValueError(f"Backup uses schema version {manifest['schema_version']}; "
+                         f"this version of FlowFox reads up to {SCHEMA_VERSION}.")
+    missing = [k for k in TABLES if k not in manifest.get("tables", {})]
+    if missing:
+        raise ValueError(f"Backup is missing tables: {', '.join(missing)}")
+    return manifest
+
+def _verify(zf: zipfile.ZipFile, kind: str, entry: dict):
+    with zf.open(entry["file"]) as member:
+        missing = set(SCHEMAS[kind]) - set(pd.read_csv(member, nrows=0).columns)
+    if missing:
+        raise ValueError(f"{entry['file']} is missing columns: {', '.join(sorted(missing))}")
+    digest = hashlib.sha256()
+    with zf.open(entry["file"]) as member:
+        for block in iter(lambda: member.read(1 << 20), b""):
+            digest.update(block)
+    if digest.hexdigest() != entry["sha256"]:
+        raise ValueError(f"Checksum mismatch for {entry['file']}; the backup is damaged.")
+
+def _chunks(zf: zipfile.ZipFile, entry: dict, chunksize: int):
+    with zf.open(entry["file"]) as member:
+        # only empty cells are missing: a note or name of "NA" stays text
+        yield from pd.read_csv(member, chunksize=chunksize, keep_default_na=False, na_values=[""])
+
+def restore_backup(src, chunksize: int = CHUNK_ROWS) -> dict:
+    """Replace every table with the archive's; returns rows restored per table.
+
+    Nothing is written unless the manifest, columns and checksums all check
+    out; the tables are then replaced under one hold of the write lock.
+    """
+    with zipfile.ZipFile(src) as zf:
+        manifest = _manifest(zf)
+        for kind in TABLES:
+            _verify(zf, kind, manifest["tables"][kind])
+        with exclusive():
+            return {kind: S.restore_table(kind, _chunks(zf, manifest["tables"][kind], chunksize)) for kind in TABLES}
@@ -0,0 +1,12 @@
+import os
+
+# Settings are read from the environment so the same code runs under
+# Streamlit and in scripts.
+DATA_DIR = os.environ.get("FLOWFOX_DATA_DIR", "data")  # the ledger used unless a session picks another (see core.scope)
+LEDGERS_DIR = os.environ.get("FLOWFOX_LEDGERS_DIR", "")  # one subdirectory per hosted ledger; empty: only DATA_DIR
+CACHE_MB = int(os.environ.get("FLOWFOX_CACHE_MB", 1024))  # cached tables across all ledgers, before the coldest are dropped
+BACKEND = os.environ.get("FLOWFOX_BACKEND", "csv").lower()  # csv | sqlite
+FORMAT = os.environ.get("FLOWFOX_FORMAT", "csv").lower()  # csv | parquet | feather (file backend)
+PERF = os.environ.get("FLOWFOX_PERF", "") not in ("", "0")  # record call timings (see core.perf)
+PARALLEL_ROWS = int(os.environ.get("FLOWFOX_PARALLEL_ROWS", 2_000_000))  # grouped sums this big use worker processes (see core.parallel)
+WORKERS = int(os.environ.get("FLOWFOX_WORKERS", 0)) or os.cpu_count() or 1
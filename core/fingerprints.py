@@ -0,0 +1,139 @@
+"""Fingerprint index of transactions, for spotting rows that are already in the ledger.
+
+A fingerprint hashes what identifies a transaction on a bank statement: the
+day, account, amount in cents, type and the note lowercased with whitespace
+collapsed (category and id are left out, so re-categorized rows still
+match). The index maps each fingerprint to how many transactions have it.
+
+It is persisted as an append-only log (<data dir>/fingerprints.bin) of
+(fingerprint, +1/-1) records next to a stamp of the transactions version it
+reflects, and kept up to date by core.storage on every transactions write
+(see apply()), so a write costs its own rows, never a pass over the ledger.
+A missing or stale stamp rebuilds the index on the next lookup.
+"""
+import os
+import numpy as np
+import pandas as pd
+from . import perf, scope, stamped, storage as S
+
+NAME = "fingerprints.bin"
+RECORD = np.dtype([("fp", "<u8"), ("n", "<i8")])
+
+_CACHE = scope.State("fingerprints")  # "index" -> (stamp, {fingerprint: count}, records in the log), per ledger
+
+def _path() -> str:
+    return os.path.join(scope.current().path, NAME)
+
+def _text_hashes(values: pd.Series) -> np.ndarray:
+    """Hash of each value lowercased with whitespace collapsed, normalizing each distinct value once."""
+    codes, uniques = pd.factorize(values.astype(object).fillna("").astype(str))
+    norm = np.array([" ".join(str(u).lower().split()) for u in uniques], dtype=object)
+    return pd.util.hash_array(norm)[codes] if len(norm) else np.zeros(len(codes), dtype="uint64")
+
+def fingerprint(tx: pd.DataFrame) -> np.ndarray:
+    """uint64 fingerprint of each row (needs date, account_id, amount, type; note optional)."""
+    note = tx["note"] if "note" in tx.columns else pd.Series("", index=tx.index)
+    keyed = pd.DataFrame({
+        "day": pd.to_datetime(tx["date"], errors="coerce").dt.normalize().to_numpy("datetime64[ns]").astype("int64"),
+        "account": pd.to_numeric(tx["account_id"], errors="coerce").fillna(-1).astype("int64").to_numpy(),
+        "cents": (pd.to_numeric(tx["amount"], errors="coerce").fillna(0.0) * 100).round().astype("int64").to_numpy(),
+        "type": _text_hashes(tx["type"]),
+        "note": _text_hashes(note),
+    })
+    return pd.util.hash_pandas_object(keyed, index=False).to_numpy()
+
+def _records(fps: np.ndarray, n: int) -> np.ndarray:
+    out = np.empty(len(fps), dtype=RECORD)
+    out["fp"], out["n"] = fps, n
+    return out
+
+def _fold(records: np.ndarray) -> dict:
+    sums = pd.Series(records["n"]).groupby(records["fp"]).sum()
+    sums = sums[sums != 0]
+    return dict(zip(sums.index.tolist(), sums.tolist()))
+
+def _persisted():
+    """(stamp, counts, records in the log) as persisted, (None, None, 0) without one."""
+    path = _path()
+    stamp = stamped.read(path)
+    hit = _CACHE.get("index")
+    if hit is None or hit[0] != stamp:
+        if stamp is None or not os.path.exists(path):
+            return None, None, 0
+        records = np.fromfile(path, dtype=RECORD)
+        perf.io("read fingerprints.bin", len(records), records.nbytes)
+        hit = _CACHE["index"] = (stamp, _fold(records), len(records))
+    return hit
+
+def _save(counts: dict, stamp: str):
+    """Write the index compacted: one record per fingerprint, carrying its count."""
+    records = np.empty(len(counts), dtype=RECORD)
+    records["fp"] = np.fromiter(counts.keys(), dtype="<u8", count=len(counts))
+    records["n"] = np.fromiter(counts.values(), dtype="<i8", count=len(counts))
+    stamped.replace(_path(), records.tofile, stamp)
+    _CACHE["index"] = (stamp, counts, len(records))
+
+def rebuild() -> dict:
+    with stamped.lock():
+        stamp = stamped.now()
+        counts = _fold(_records(fingerprint(S.load_transactions()), 1))
+        _save(counts, stamp)
+    return counts
+
+def _index() -> dict:
+    stamp, counts, _ = _persisted()
+    if stamp != stamped.now():
+        counts = rebuild()
+    return counts
+
+def apply(before, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+    """Log a transactions write that moved the table from version `before`."""
+    stamp, counts, logged = _persisted()
+    if stamp is None or stamp != repr(before):
+        return  # already stale; rebuilt on the next lookup
+    parts = [_records(fingerprint(df), n) for df, n in ((added, 1), (removed, -1)) if df is not None and len(df)]
+    if parts:
+        delta = np.concatenate(parts)
+        for fp, n in _fold(delta).items():
+            left = counts.get(fp, 0) + n
+            if left:
+                counts[fp] = left
+            else:
+                counts.pop(fp, None)
+        with open(_path(), "ab") as f:
+            delta.tofile(f)
+        logged += len(delta)
+    stamp = stamped.now()
+    if logged > 2 * len(counts) + 100_000:
+        _save(counts, stamp)  # mostly cancelled-out records: compact
+    else:
+        stamped.mark(_path(), stamp)
+        _CACHE["index"] = (stamp, counts, logged)
+
+def lookup(fps) -> np.ndarray:
+    """How many transactions in the ledger have each fingerprint (one dict lookup per row)."""
+    index = _index()
+    return np.fromiter((index.get(fp, 0) for fp in np.asarray(fps, dtype="<u8").tolist()), dtype="int64", count=len(fps))
+
+class ImportFilter:
+    """Tells which rows of an import, fed chunk by chunk, are already in the ledger.
+
+    The n-th row of the file with a given fingerprint is a duplicate if the
+    ledger held at least n such rows when the import began, so re-importing an
+    overlapping export adds only the new rows, while genuinely repeated rows
+    (two identical coffees on one day) are kept.
+    """
+    def __init__(self):
+        self._before = {}  # fingerprint -> ledger count before this import
+        self._seen = {}  # fingerprint -> rows of this file so far
+
+    def new_rows(self, rows: pd.DataFrame) -> np.ndarray:
+        """Mask over `rows`: True where the row is not in the ledger yet."""
+        fps = pd.Series(fingerprint(rows))
+        unknown = fps[fps.map(self._before).isna()].unique()
+        # never-seen fingerprints can't include rows this import added, so the live count is the original
+        self._before.update(zip(unknown.tolist(), lookup(unknown).tolist()))
+        nth = fps.map(self._seen).fillna(0).to_numpy("int64") + fps.groupby(fps).cumcount().to_numpy() + 1
+        for fp, n in fps.value_counts().items():
+            self._seen[fp] = self._seen.get(fp, 0) + n
+        return nth > fps.map(self._before).to_numpy("int64")
@@ -0,0 +1,86 @@
+"""Per-account running balances with month-end snapshots.
+
+A snapshot is an account's balance at the end of a month with activity, net
+of its starting balance. Snapshots are accumulated from the persisted monthly
+rollup (core.rollup) once per transactions version, so a balance as of any
+date is the last snapshot before that month plus the month's transactions up
+to the date, never a pass over the full history.
+
+Income adds to an account; expenses and savings (transfers to savings, see the
+Categories page) take from it. Savings also count towards `saved`, the running
+total set aside.
+"""
+from datetime import date
+import pandas as pd
+from . import scope, storage as S, rollup as R
+from .schema import ID
+
+SIGNS = {"income": 1.0, "expense": -1.0, "savings": -1.0}
+COLUMNS = ["account_id", "period", "net", "balance", "saved"]
+
+_CACHE = scope.State("ledger")  # "snapshots" -> (transactions version, (snapshots, undated totals)), per ledger
+
+def _flows(sums: pd.DataFrame) -> pd.DataFrame:
+    """Signed net and savings per row of a (type, amount) frame."""
+    kind, amount = sums["type"].astype(str), sums["amount"].astype(float)
+    return sums.assign(net=amount * kind.map(SIGNS).fillna(0.0), saved=amount.where(kind == "savings", 0.0))
+
+def _build():
+    r = R.load()
+    r = _flows(r.assign(account_id=r["account_id"].astype(ID)))
+    dated = r[r["period"].notna()]
+    snap = (dated.groupby(["account_id", "period"], dropna=False)[["net", "saved"]].sum()
+                 .reset_index().sort_values(["account_id", "period"], ignore_index=True))
+    running = snap.groupby("account_id", dropna=False)
+    snap["balance"] = running["net"].cumsum()
+    snap["saved"] = running["saved"].cumsum()
+    # rows without a date count towards current balances only
+    undated = r[r["period"].isna()].groupby("account_id", dropna=False)[["net", "saved"]].sum()
+    return snap[COLUMNS], undated
+
+def _snapshots():
+    v = S.version("transactions")
+    hit = _CACHE.get("snapshots")
+    if hit is None or hit[0] != v:
+        hit = _CACHE["snapshots"] = (v, _build())
+    return hit[1]
+
+def snapshots() -> pd.DataFrame:
+    """Month-end snapshots: per account and month, the month's `net` flow and the
+    running `balance` and `saved` at its end (starting balances not included)."""
+    return _snapshots()[0].copy()
+
+def _with_starts(flows: pd.DataFrame) -> pd.DataFrame:
+    acc = S.load_accounts()[["id", "name", "starting_balance"]]
+    out = acc.merge(flows, left_on="id", right_index=True, how="left").fillna({"net": 0.0, "saved": 0.0})
+    return pd.DataFrame({"account_id": out["id"], "account": out["name"],
+                         "balance": out["starting_balance"] + out["net"], "saved": out["saved"]}).reset_index(drop=True)
+
+def balances(as_of: date = None) -> pd.DataFrame:
+    """Balance and amount saved per account at the end of `as_of` (default: now)."""
+    snap, undated = _snapshots()
+    if as_of is None:
+        last = snap.groupby("account_id", dropna=False)[["balance", "saved"]].last().rename(columns={"balance": "net"})
+        return _with_starts(last.add(undated, fill_value=0.0))
+    month = pd.Timestamp(as_of).to_period("M")
+    before = snap[snap["period"] < str(month)]
+    last = before.groupby("account_id", dropna=False)[["balance", "saved"]].last().rename(columns={"balance": "net"})
+    partial = _flows(S.sum_transactions(month.start_time.date(), as_of, by=["account_id", "type"]))
+    partial = partial.groupby("account_id", dropna=False)[["net", "saved"]].sum()
+    return _with_starts(last.add(partial, fill_value=0.0))
+
+def balance_series(end: date = None) -> pd.DataFrame:
+    """Month-end balance of every account from its first month with activity
+    through `end` (default: the last month with activity), for charting."""
+    snap = _snapshots()[0]
+    acc = S.load_accounts()[["id", "name", "starting_balance"]]
+    if snap.empty or acc.empty:
+        return pd.DataFrame(columns=["period", "account_id", "account", "balance"])
+    last = pd.Period(snap["period"].max(), freq="M") if end is None else pd.Timestamp(end).to_period("M")
+    periods = pd.period_range(pd.Period(snap["period"].min(), freq="M"), last, freq="M").strftime("%Y-%m")
+    wide = (snap[snap["account_id"].isin(acc["id"])].pivot(index="period", columns="account_id", values="balance")
+                .reindex(index=periods).ffill().fillna(0.0))
+    wide = wide.reindex(columns=acc["id"], fill_value=0.0) + acc.set_index("id")["starting_balance"]
+    out = wide.rename_axis(index="period", columns="account_id").stack().rename("balance").reset_index()
+    out["account"] = out["account_id"].map(acc.set_index("id")["name"])
+    return out[["period", "account_id", "account", "balance"]]
@@ -1,57 +1,284 @@
 from datetime import date
-import calendar
+from concurrent.futures import Future, ThreadPoolExecutor
+import calendar, threading
+import numpy as np
 import pandas as pd
-from . import storage as S
+from . import perf, scope, storage as S, rollup as R, ledger, search
 
 def get_month_bounds(year: int, month: int):
     start = date(year, month, 1)
     end = date(year, month, calendar.monthrange(year, month)[1])
     return start, end
 
-def _between(df: pd.DataFrame, col: str, start: date, end: date):
-    if df.empty: return df
-    if df[col].dtype != "datetime64[ns]":
-        df[col] = pd.to_datetime(df[col])
-    return df[(df[col] >= pd.to_datetime(start)) & (df[col] <= pd.to_datetime(end))]
+class TransactionIndex:
+    """Transactions sorted by (date, id), answering date-range queries by binary search.
+
+    Build it once (see transaction_index()) and share it across any number of
+    windows: between() is two searchsorted calls and a positional slice of the
+    sorted frame, so nothing is scanned or copied per query.
+    """
+    def __init__(self, tx: pd.DataFrame, presorted: bool = False):
+        self.frame = tx if presorted else tx.sort_values(["date", "id"], na_position="last", ignore_index=True)
+        # undated rows sort last and are left out of every range
+        self._dates = self.frame["date"].to_numpy()[: int(self.frame["date"].notna().sum())]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def span(self, start, end) -> slice:
+        """Positions of the rows dated start..end (inclusive); None leaves that side open."""
+        lo = 0 if start is None else self._dates.searchsorted(np.datetime64(pd.Timestamp(start)), "left")
+        hi = len(self.frame) if end is None else self._dates.searchsorted(np.datetime64(pd.Timestamp(end)), "right")
+        return slice(int(lo), int(max(lo, hi)))
+
+    def between(self, start, end) -> pd.DataFrame:
+        return self.frame.iloc[self.span(start, end)]
+
+    def select(self, start, end, types=None) -> np.ndarray:
+        """Positions of the rows dated start..end, optionally only of some types, in (date, id) order."""
+        span = self.span(start, end)
+        pos = np.arange(span.start, span.stop)
+        if types:
+            pos = pos[self.frame["type"].iloc[span].isin(list(types)).to_numpy()]
+        return pos
+
+_INDEX = scope.State("logic.index")  # "transactions" -> (storage version, TransactionIndex), per ledger
+
+def transaction_index() -> TransactionIndex:
+    """The shared index over the current transactions, rebuilt only when they change."""
+    v = S.version("transactions")
+    hit = _INDEX.get("transactions")
+    if hit is None or hit[0] != v:
+        hit = _INDEX["transactions"] = (v, TransactionIndex(S.load_transactions_by_date(), presorted=True))
+    return hit[1]
+
+def _matching(start_dt, end_dt, types=None, query: str = None):
+    idx = transaction_index()
+    pos = idx.select(start_dt, end_dt, types)
+    if query:
+        pos = search.filter_positions(idx.frame, pos, query)
+    return idx, pos
+
+def transactions_page(start_dt, end_dt, types=None, offset: int = 0, limit: int = 50, query: str = None):
+    """One page of the transactions dated start_dt..end_dt, newest first, and how many match in all.
+
+    query filters on note, account and category name (see core.search).
+    """
+    idx, pos = _matching(start_dt, end_dt, types, query)
+    pos = pos[::-1]
+    return idx.frame.take(pos[offset:offset + limit]), len(pos)
+
+def transactions_preview(start_dt, end_dt, limit: int = 500):
+    """The newest `limit` transactions dated start_dt..end_dt with account and
+    category names, and how many there are in all."""
+    page, total = transactions_page(start_dt, end_dt, limit=limit)
+    acc = S.load_accounts().set_index("id")["name"]
+    cats = S.load_categories().set_index("id")["name"]
+    out = page.assign(account=page["account_id"].map(acc), category=page["category_id"].map(cats))
+    return out[["date", "type", "account", "category", "amount", "note"]].reset_index(drop=True), total
+
+def transaction_totals(start_dt, end_dt, types=None, query: str = None):
+    """(income, expenses, net) of the transactions transactions_page() pages through.
+
+    Without a query these come from the rollup; with one, from the matching rows.
+    """
+    if query:
+        idx, pos = _matching(start_dt, end_dt, types, query)
+        rows = idx.frame.take(pos)
+        income, expenses = _type_totals(rows.groupby("type", observed=True)["amount"].sum().reset_index())
+    else:
+        income, expenses = _type_totals(R.totals(start_dt, end_dt, by=["type"]))
+        income = income if not types or "income" in types else 0.0
+        expenses = expenses if not types or "expense" in types else 0.0
+    return income, expenses, income - expenses
+
+def _type_totals(sums: pd.DataFrame):
+    by_type = sums.set_index("type")["amount"]
+    return float(by_type.get("income", 0.0)), float(by_type.get("expense", 0.0))
 
 def totals_for_period(start_dt: date, end_dt: date):
-    tx = S.load_transactions()
-    txp = _between(tx, "date", start_dt, end_dt)
-    income = txp.loc[txp["type"] == "income", "amount"].sum()
-    expenses = txp.loc[txp["type"] == "expense", "amount"].sum()
+    income, expenses = _type_totals(R.totals(start_dt, end_dt, by=["type"]))
     return float(income), float(expenses), float(income - expenses)
 
+def all_time_totals():
+    income, expenses = _type_totals(R.totals(by=["type"]))
+    return income, expenses, income - expenses
+
 def current_savings():
-    tx = S.load_transactions()
-    inc = tx.loc[tx["type"] == "income", "amount"].sum()
-    exp = tx.loc[tx["type"] == "expense", "amount"].sum()
-    starts = S.load_accounts()["starting_balance"].sum()
-    return float(inc - exp + starts)
+    """Money across all accounts plus what has been moved to savings."""
+    b = ledger.balances()
+    return float(b["balance"].sum() + b["saved"].sum())
 
 def expenses_by_category(start_dt: date, end_dt: date) -> pd.DataFrame:
-    tx = S.load_transactions()
-    cats = S.load_categories()
-    txp = _between(tx, "date", start_dt, end_dt)
-    exp = txp[txp["type"] == "expense"]
+    sums = R.totals(start_dt, end_dt, by=["type", "category_id"])
+    exp = sums[sums["type"] == "expense"]
     if exp.empty:
         return pd.DataFrame(columns=["category","amount"])
+    cats = S.load_categories()
     merged = exp.merge(cats[["id","name"]], left_on="category_id", right_on="id", how="left")
     out = merged.groupby("name", dropna=False)["amount"].sum().reset_index().rename(columns={"name":"category"})
     out = out.sort_values(["amount","category"], ascending=[False, True])
     return out
 
-def monthly_cashflow(reference_year: int, reference_month: int, months: int = 6) -> pd.DataFrame:
-    periods = []
-    y, m = reference_year, reference_month
-    for _ in range(months-1, -1, -1):
-        periods.append((y, m, f"{y:04d}-{m:02d}"))
-        # move back one month
-        m -= 1
-        if m == 0: m, y = 12, y - 1
-
-    rows = []
-    for yy, mm, label in reversed(periods):
-        s, e = get_month_bounds(yy, mm)
-        inc, exp, net = totals_for_period(s, e)
-        rows.append({"period": label, "income": inc, "expenses": exp, "net": net})
-    return pd.DataFrame(rows)
+# Cashflow granularities -> pandas period frequencies
+FREQS = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}
+
+def _period_labels(periods: pd.PeriodIndex, freq: str) -> list:
+    if freq == "quarter":
+        return [f"{p.year}-Q{p.quarter}" for p in periods]
+    return list(periods.start_time.strftime({"week": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}[freq]))
+
+def _trend(periods, labels: list, flows: pd.DataFrame) -> pd.DataFrame:
+    """period/income/expenses/net rows for `periods`, from per-period sums with a column per type.
+
+    Periods and types missing from `flows` count as zero.
+    """
+    flows = flows.reindex(index=periods, columns=["income", "expense"]).fillna(0.0)
+    return pd.DataFrame({
+        "period": labels,
+        "income": flows["income"].to_numpy(dtype=float),
+        "expenses": flows["expense"].to_numpy(dtype=float),
+        "net": (flows["income"] - flows["expense"]).to_numpy(dtype=float),
+    })
+
+def cashflow(start_dt: date, end_dt: date, freq: str = "month") -> pd.DataFrame:
+    """Income, expenses and net per period between two dates, in one grouped pass.
+
+    Periods without transactions are present with zeros.
+    """
+    f = FREQS[freq]
+    periods = pd.period_range(pd.Timestamp(start_dt), pd.Timestamp(end_dt), freq=f)
+    tx = S.load_transactions_between(start_dt, end_dt, columns=["date", "type", "amount"])
+    tx = tx[tx["type"].isin(["income", "expense"])]
+    flows = pd.DataFrame()
+    if not tx.empty:
+        flows = tx.groupby([tx["date"].dt.to_period(f), "type"], observed=True)["amount"].sum().unstack("type")
+    return _trend(periods, _period_labels(periods, freq), flows)
+
+def monthly_cashflow(reference_year: int, reference_month: int, months: int = 6, freq: str = "month") -> pd.DataFrame:
+    """Cashflow over the `months` calendar months ending at the reference month."""
+    ref = pd.Period(year=reference_year, month=reference_month, freq="M")
+    if freq != "month":
+        return cashflow((ref - (months - 1)).start_time.date(), ref.end_time.date(), freq)
+    # whole calendar months: straight from the rollup, no transaction reads
+    periods = pd.period_range(ref - (months - 1), ref, freq="M").strftime("%Y-%m")
+    sums = R.totals(pd.Period(periods[0]).start_time, ref.end_time, by=["period", "type"])
+    return _trend(periods, list(periods), sums.groupby(["period", "type"])["amount"].sum().unstack("type"))
+
+class Dashboard:
+    """Everything the Dashboard and Reports overview show for one month, from one scan.
+
+    The trend window is the `months` calendar months ending with the month, so
+    the month is part of it: one grouped pass over the window's rows (only
+    those are read, see storage.load_transactions_between), keyed by trend
+    period, type, category and whether the row falls in the month, gives the
+    month's KPIs and category breakdowns as well as the trend series.
+    """
+    def __init__(self, year: int, month: int, months: int = 6, freq: str = "month", top: int = 5):
+        self.start, self.end = get_month_bounds(year, month)
+        ref = pd.Period(year=year, month=month, freq="M")
+        first = (ref - (months - 1)).start_time.date()
+        f = FREQS[freq]
+        periods = pd.period_range(pd.Timestamp(first), pd.Timestamp(self.end), freq=f)
+
+        tx = S.load_transactions_between(first, self.end, columns=["date", "type", "category_id", "amount"])
+        in_month = (tx["date"] >= pd.Timestamp(self.start)).rename("in_month")
+        sums = tx.groupby([tx["date"].dt.to_period(f).rename("period"), in_month,
+                           "type", "category_id"], observed=True, dropna=False)["amount"].sum()
+
+        month_sums = sums[sums.index.get_level_values("in_month")].droplevel(["period", "in_month"])
+        by_type = month_sums.groupby(level="type", observed=True).sum()
+        self.income = float(by_type.get("income", 0.0))
+        self.expenses = float(by_type.get("expense", 0.0))
+        self.net = self.income - self.expenses
+        self.savings = current_savings()
+
+        names = S.load_categories().set_index("id")["name"]
+        self.expense_by_category = _by_name(month_sums, "expense", names)
+        self.income_by_category = _by_name(month_sums, "income", names)
+        self.top_expenses = self.expense_by_category.head(top)
+        self.top_income = self.income_by_category.head(top)
+
+        self.trend = _trend(periods, _period_labels(periods, freq),
+                            sums.groupby(level=["period", "type"], observed=True).sum().unstack("type"))
+
+def _by_name(sums: pd.Series, kind: str, names: pd.Series) -> pd.DataFrame:
+    """(category, amount) of one type's per-category sums, largest first."""
+    part = sums[sums.index.get_level_values("type") == kind].droplevel("type")
+    if part.empty:
+        return pd.DataFrame(columns=["category", "amount"])
+    out = part.groupby(part.index.map(names), dropna=False).sum().rename_axis("category").reset_index(name="amount")
+    return out.sort_values(["amount", "category"], ascending=[False, True], ignore_index=True)
+
+# Per ledger: "versions" -> (transactions, categories, accounts versions); args -> Dashboard
+_DASHBOARDS = scope.State("logic.dashboards")
+
+def dashboard(year: int, month: int, months: int = 6, freq: str = "month", top: int = 5) -> Dashboard:
+    """The Dashboard for a month and trend window, shared until the data changes."""
+    v = (S.version("transactions"), S.version("categories"), S.version("accounts"))
+    if _DASHBOARDS.get("versions") != v:
+        _DASHBOARDS.clear()
+        _DASHBOARDS["versions"] = v
+    key = (int(year), int(month), int(months), freq, int(top))
+    dash = _DASHBOARDS.get(key)
+    if dash is None:
+        dash = _DASHBOARDS[key] = Dashboard(*key)
+    return dash
+
+def budget_matrix(start_period: str, end_period: str) -> pd.DataFrame:
+    """Budget vs actual for every expense category and month from start_period
+    to end_period ("YYYY-MM"), one row per (category, period).
+
+    spent comes from the monthly rollup in one grouped pass; utilization is
+    spent / budget (NaN where there is no budget) and rollover the budget left
+    over (negative when overspent) from the span's first month through this
+    one, i.e. what carries into the next month.
+    """
+    periods = pd.period_range(start_period, end_period, freq="M").strftime("%Y-%m")
+    cats = S.load_categories()
+    cats = cats[cats["kind"] == "expense"].sort_values("name")
+    grid = pd.MultiIndex.from_product([cats["id"].astype(int), periods], names=["category_id", "period"])
+
+    r = R.load()
+    r = r[(r["type"] == "expense") & r["period"].isin(periods) & r["category_id"].notna()]
+    spent = r.groupby([r["category_id"].astype(int), "period"])["amount"].sum()
+    bud = S.load_budgets()
+    bud = bud[bud["period"].isin(periods)]
+    budget = bud.groupby([bud["category_id"].astype(int), bud["period"].astype(str)])["amount"].sum()
+
+    out = pd.DataFrame({"budget": budget.reindex(grid, fill_value=0.0).to_numpy(dtype=float),
+                        "spent": spent.reindex(grid, fill_value=0.0).to_numpy(dtype=float)}, index=grid).reset_index()
+    out.insert(1, "category", out["category_id"].map(cats.set_index("id")["name"]))
+    out["utilization"] = out["spent"] / out["budget"].where(out["budget"] > 0)
+    out["rollover"] = (out["budget"] - out["spent"]).groupby(out["category_id"]).cumsum()
+    return out
+
+# Shared pool for page aggregations that don't depend on each other (see precompute())
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="flowfox-precompute")
+_PENDING = scope.State("logic.pending")  # "versions" -> data versions; (function name, args) -> Future, per ledger
+_PENDING_LOCK = threading.Lock()
+MAX_PENDING = 64
+
+def precompute(fn, *args) -> Future:
+    """Start fn(*args) on the shared pool and return its future.
+
+    Futures are shared per ledger, data version and arguments, so every session
+    and rerun asking for the same thing gets the same (possibly finished) result;
+    a failed one is retried on the next call. Pages submit everything they will
+    show up front and wait on each result only where it is drawn.
+    """
+    v = tuple(S.version(k) for k in ("transactions", "categories", "accounts", "budgets"))
+    key = (fn.__name__, args)
+    with _PENDING_LOCK:
+        if _PENDING.get("versions") != v:
+            _PENDING.clear()
+            _PENDING["versions"] = v
+        fut = _PENDING.get(key)
+        if fut is None or (fut.done() and fut.exception() is not None):
+            if len(_PENDING) > MAX_PENDING:
+                _PENDING.pop(next(k for k in _PENDING if k != "versions"))  # oldest first
+            fut = _PENDING[key] = _POOL.submit(scope.carry(perf.carry(fn)), *args)
+    return fut
+
+# Timing for every public function above (opt-in, see core.perf)
+perf.instrument(globals())
@@ -0,0 +1,101 @@
+"""Grouped sums over large transaction sets, split across worker processes.
+
+grouped_sum() factorizes the key columns into one integer group code per row
+and sums the amounts per code block by block, BLOCK_ROWS rows at a time
+(np.bincount), then adds the block partials up in block order. Above
+config.PARALLEL_ROWS rows the blocks are handed to a ProcessPoolExecutor:
+the codes and amounts are copied once into shared memory, each worker maps
+them and returns only its blocks' per-group partials. Below it, the same
+blocks are summed in-process. Either way the partials are combined in the same
+order, so the parallel result is bit-for-bit the serial one.
+"""
+import atexit, multiprocessing, threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+from . import config
+
+BLOCK_ROWS = 1 << 20
+MAX_GROUPS = 1 << 22  # dense per-block partials; beyond this, plain pandas
+
+_pool = {"executor": None}
+_pool_lock = threading.Lock()
+
+def _executor() -> ProcessPoolExecutor:
+    with _pool_lock:
+        if _pool["executor"] is None:
+            # spawn: the app is multi-threaded, and forking a threaded process can deadlock
+            _pool["executor"] = ProcessPoolExecutor(config.WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_pool["executor"].shutdown, cancel_futures=True)
+        return _pool["executor"]
+
+def _block_sums(codes: np.ndarray, values: np.ndarray, n_groups: int):
+    return (np.bincount(codes, weights=values, minlength=n_groups),
+            np.bincount(codes, minlength=n_groups))
+
+def _worker(names: tuple, n: int, blocks: list, n_groups: int) -> list:
+    """Per-group (sums, counts) of each [lo, hi) block of the shared columns."""
+    shm = [shared_memory.SharedMemory(name=name) for name in names]
+    try:
+        codes = np.ndarray((n,), dtype=np.int64, buffer=shm[0].buf)
+        values = np.ndarray((n,), dtype=np.float64, buffer=shm[1].buf)
+        out = [_block_sums(codes[lo:hi], values[lo:hi], n_groups) for lo, hi in blocks]
+        del codes, values  # release the buffers before closing
+        return out
+    finally:
+        for s in shm:
+            s.close()
+
+def _partials(codes: np.ndarray, values: np.ndarray, n_groups: int, parallel: bool) -> list:
+    n = len(codes)
+    blocks = [(lo, min(lo + BLOCK_ROWS, n)) for lo in range(0, n, BLOCK_ROWS)]
+    if not parallel or len(blocks) < 2 or config.WORKERS < 2:
+        return [_block_sums(codes[lo:hi], values[lo:hi], n_groups) for lo, hi in blocks]
+    shm = [shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1)) for a in (codes, values)]
+    try:
+        for s, a in zip(shm, (codes, values)):
+            np.ndarray(a.shape, dtype=a.dtype, buffer=s.buf)[:] = a
+        per = -(-len(blocks) // config.WORKERS)
+        jobs = [blocks[i:i + per] for i in range(0, len(blocks), per)]
+        names = tuple(s.name for s in shm)
+        results = _executor().map(_worker, [names] * len(jobs), [n] * len(jobs), jobs, [n_groups] * len(jobs))
+        return [part for job in results for part in job]  # job and block order, as in the serial path
+    finally:
+        for s in shm:
+            s.close()
+            s.unlink()
+
+def grouped_sum(frame: pd.DataFrame, by: list, value: str = "amount", parallel: bool = None) -> pd.DataFrame:
+    """frame.groupby(by, dropna=False, observed=True)[value].agg(amount="sum", count="size"),
+    reset to columns, with groups in the same (sorted, missing last) order.
+
+    parallel=None decides by size (config.PARALLEL_ROWS); True/False force it.
+    """
+    by = list(by)
+    codes, uniques = [], []
+    for col in by:
+        c, u = pd.factorize(frame[col], sort=True)
+        codes.append(np.where(c < 0, len(u), c))  # missing sorts last
+        uniques.append(u)
+    shape = tuple(len(u) + 1 for u in uniques)
+    if not by or np.prod(shape, dtype=float) > MAX_GROUPS:
+        return frame.groupby(by, dropna=False, observed=True)[value].agg(amount="sum", count="size").reset_index()
+    group = np.ravel_multi_index(codes, shape).astype(np.int64, copy=False) if len(frame) else np.zeros(0, np.int64)
+    values = frame[value].to_numpy(dtype=np.float64, na_value=np.nan)
+    values = np.where(np.isnan(values), 0.0, values)  # sum skips missing amounts; count still counts the row
+    n_groups = int(np.prod(shape))
+    if parallel is None:
+        parallel = len(frame) >= config.PARALLEL_ROWS
+    sums, counts = np.zeros(n_groups), np.zeros(n_groups, dtype=np.int64)
+    for s, c in _partials(group, values, n_groups, parallel):
+        sums += s
+        counts += c
+    hit = np.flatnonzero(counts)
+    keys = np.unravel_index(hit, shape)
+    out = {col: _keys(u, k) for col, u, k in zip(by, uniques, keys)}
+    return pd.DataFrame({**out, "amount": sums[hit], "count": counts[hit]})
+
+def _keys(uniques, positions: np.ndarray) -> pd.Series:
+    """Key values at `positions` of the factorized uniques; the extra last position is missing."""
+    return pd.Series(uniques).reindex(positions).reset_index(drop=True)
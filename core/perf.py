@@ -0,0 +1,126 @@
+"""Opt-in instrumentation of core.storage, core.logic and the backends' reads.
+
+Off unless FLOWFOX_PERF=1 or enable() is called (Settings → Performance).
+While on, every public storage/logic call records its count, wall time
+(including nested calls) and rows returned, and every file or query read
+records its rows and bytes under "read <file>" or "sqlite query". Records are
+grouped per run: each page starts one with page(name) at the top of the
+script, so a run is one Streamlit rerun of that page. The last MAX_RUNS runs
+are kept in memory for the whole process.
+"""
+import functools, inspect, json, threading, time
+from collections import deque
+from datetime import datetime
+import pandas as pd
+from . import config
+
+MAX_RUNS = 50
+
+_state = {"enabled": config.PERF}
+_runs = deque(maxlen=MAX_RUNS)
+_runs_lock = threading.Lock()
+_local = threading.local()  # Streamlit runs each session's script in its own thread
+
+def enabled() -> bool:
+    return _state["enabled"]
+
+def enable(on: bool = True):
+    _state["enabled"] = bool(on)
+
+def page(name: str):
+    """Start a new run for the current thread (call at the top of a page)."""
+    run = {"page": name, "started": datetime.now().isoformat(timespec="seconds"),
+           "t0": time.perf_counter(), "wall_s": 0.0, "calls": {}}
+    _local.run = run
+    if _state["enabled"]:
+        with _runs_lock:
+            _runs.append(run)
+
+def _current() -> dict:
+    run = getattr(_local, "run", None)
+    if run is None:
+        page("script")
+        run = _local.run
+    return run
+
+def carry(fn):
+    """fn bound to the calling thread's run, for work handed to a pool thread."""
+    run = getattr(_local, "run", None)
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        prev = getattr(_local, "run", None)
+        _local.run = run
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.run = prev
+    return bound
+
+def record(name: str, seconds: float = 0.0, rows: int = 0, nbytes: int = 0):
+    if not _state["enabled"]:
+        return
+    run = _current()
+    stat = run["calls"].setdefault(name, {"calls": 0, "time_s": 0.0, "rows": 0, "bytes": 0})
+    stat["calls"] += 1
+    stat["time_s"] += seconds
+    stat["rows"] += rows
+    stat["bytes"] += nbytes
+    run["wall_s"] = time.perf_counter() - run["t0"]
+
+def io(name: str, rows: int, nbytes: int):
+    """Record one read from disk or the database."""
+    record(name, rows=rows, nbytes=nbytes)
+
+def _wrap(name: str, fn):
+    @functools.wraps(fn)
+    def timed(*args, **kwargs):
+        if not _state["enabled"]:
+            return fn(*args, **kwargs)
+        t = time.perf_counter()
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        finally:
+            record(name, time.perf_counter() - t, rows=len(result) if isinstance(result, pd.DataFrame) else 0)
+    return timed
+
+def instrument(namespace: dict):
+    """Wrap the public functions defined in a module (pass its globals())."""
+    module = namespace["__name__"]
+    for name, fn in list(namespace.items()):
+        if not name.startswith("_") and inspect.isfunction(fn) and fn.__module__ == module:
+            namespace[name] = _wrap(f"{module.rsplit('.', 1)[-1]}.{name}", fn)
+
+def runs(n: int = MAX_RUNS) -> list:
+    """The last n runs, newest first."""
+    with _runs_lock:
+        recent = list(_runs)[-n:]
+    return [{k: v for k, v in r.items() if k != "t0"} for r in reversed(recent)]
+
+def summary(n: int = MAX_RUNS) -> pd.DataFrame:
+    """One row per run: page, start, tracked wall time, calls and reads."""
+    rows = [{"page": r["page"], "started": r["started"], "wall_s": round(r["wall_s"], 4),
+             "calls": sum(s["calls"] for k, s in r["calls"].items() if not k.startswith(("read ", "sqlite"))),
+             "reads": sum(s["calls"] for k, s in r["calls"].items() if k.startswith(("read ", "sqlite"))),
+             "bytes_read": sum(s["bytes"] for s in r["calls"].values())} for r in runs(n)]
+    return pd.DataFrame(rows, columns=["page", "started", "wall_s", "calls", "reads", "bytes_read"])
+
+def offenders(n: int = MAX_RUNS, top: int = 15) -> pd.DataFrame:
+    """Calls and reads over the last n runs, most time first (times include nested calls)."""
+    rows = [{"page": r["page"], "name": k, **s} for r in runs(n) for k, s in r["calls"].items()]
+    cols = ["page", "name", "calls", "time_s", "rows", "bytes"]
+    if not rows:
+        return pd.DataFrame(columns=cols + ["per_run"])
+    df = pd.DataFrame(rows).groupby(["page", "name"], as_index=False)[cols[2:]].sum()
+    per_page = pd.DataFrame([r["page"] for r in runs(n)], columns=["page"]).value_counts().rename("runs").reset_index()
+    df = df.merge(per_page, on="page")
+    df["per_run"] = (df["calls"] / df["runs"]).round(1)
+    return df.sort_values(["time_s", "calls"], ascending=False).head(top)[cols + ["per_run"]].reset_index(drop=True)
+
+def export(n: int = MAX_RUNS) -> bytes:
+    return json.dumps({"exported": datetime.now().isoformat(timespec="seconds"), "runs": runs(n)}, indent=2).encode("utf-8")
+
+def clear():
+    with _runs_lock:
+        _runs.clear()
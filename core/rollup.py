@@ -0,0 +1,148 @@
+"""Monthly rollup of transactions, keyed by (period, type, category_id, account_id).
+
+The rollup is persisted next to the data (<data dir>/rollup.csv) and kept up to
+date by core.storage, which hands every transactions write to apply() as
+added/removed rows. apply() appends those rows' signed sums to the file as a
+log, so a write costs its own rows; readers fold the log in, and it is
+compacted once it outgrows the rollup. A stamp file records the transactions
+version the rollup reflects; if it is missing or stale (e.g. the CSV was
+edited by hand) the rollup is rebuilt on the next read. `python -m core.rollup [--rebuild]` checks
+it against the raw transactions.
+"""
+import os, sys
+import pandas as pd
+from . import parallel, perf, scope, stamped, storage as S
+from .schema import month_labels
+
+NAME = "rollup.csv"
+KEYS = ["period", "type", "category_id", "account_id"]
+COLUMNS = KEYS + ["amount", "count"]
+
+_CACHE = scope.State("rollup")  # "rollup" -> (stamp, frames, rows in the file), per ledger (see _logged())
+
+def _path() -> str:
+    return os.path.join(scope.current().path, NAME)
+
+def aggregate(tx: pd.DataFrame) -> pd.DataFrame:
+    """Roll transaction rows up to COLUMNS."""
+    if tx is None or tx.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    keyed = pd.DataFrame({"period": month_labels(tx["date"]), "type": tx["type"].astype(object),
+                          "category_id": tx["category_id"], "account_id": tx["account_id"],
+                          "amount": tx["amount"].astype(float)})
+    return parallel.grouped_sum(keyed, KEYS)  # worker processes for multi-million-row ledgers
+
+def _combine(*parts: pd.DataFrame) -> pd.DataFrame:
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=COLUMNS)
+    out = pd.concat(parts, ignore_index=True).groupby(KEYS, dropna=False, observed=True)[["amount", "count"]].sum().reset_index()
+    return out[out["count"] != 0]
+
+def _save(df: pd.DataFrame, stamp: str):
+    """Write the rollup compacted: one row per key."""
+    stamped.replace(_path(), lambda tmp: df.to_csv(tmp, index=False), stamp)
+    _CACHE["rollup"] = (stamp, [df], len(df))
+
+def _logged():
+    """(stamp, [rollup, deltas logged since it was folded...], rows in the file), (None, None, 0) without one."""
+    path = _path()
+    stamp = stamped.read(path)
+    hit = _CACHE.get("rollup")
+    if hit is None or hit[0] != stamp:
+        if stamp is None or not os.path.exists(path):
+            return None, None, 0
+        df = pd.read_csv(path, dtype={"period": str, "type": str})
+        perf.io("read rollup.csv", len(df), os.path.getsize(path))
+        hit = _CACHE["rollup"] = (stamp, [_combine(df)], len(df))
+    return hit
+
+def _persisted():
+    """(stamp, rollup) as persisted, (None, None) without one."""
+    stamp, frames, _ = _logged()
+    if frames is None:
+        return None, None
+    if len(frames) > 1:  # fold in what apply() logged since the last read
+        frames[:] = [_combine(*frames)]
+    return stamp, frames[0]
+
+def rebuild() -> pd.DataFrame:
+    with stamped.lock():
+        stamp = stamped.now()
+        df = aggregate(S.load_transactions())
+        _save(df, stamp)
+    return df
+
+def load() -> pd.DataFrame:
+    """The rollup for the current transactions, rebuilt first if stale."""
+    stamp, df = _persisted()
+    if stamp != stamped.now():
+        df = rebuild()
+    return df.copy()
+
+def apply(before, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+    """Log a transactions write that moved the table from version `before`."""
+    stamp, frames, logged = _logged()
+    if stamp is None or stamp != repr(before):
+        return  # already stale; load() rebuilds
+    neg = aggregate(removed)
+    neg = neg.assign(amount=-neg["amount"], count=-neg["count"])
+    delta = pd.concat([p for p in (aggregate(added), neg) if not p.empty] or [neg], ignore_index=True)[COLUMNS]
+    if len(delta):
+        delta.to_csv(_path(), mode="a", header=False, index=False)
+        frames = frames + [delta]
+        logged += len(delta)
+    stamp = stamped.now()
+    if logged > 2 * len(frames[0]) + 10_000:
+        _save(_combine(*frames), stamp)  # mostly folded-in records: compact
+    else:
+        stamped.mark(_path(), stamp)
+        _CACHE["rollup"] = (stamp, frames, logged)
+
+def totals(start_dt=None, end_dt=None, by=("type",)) -> pd.DataFrame:
+    """Grouped amount sum and count like storage.sum_transactions, answered from the rollup.
+
+    Whole months come from the rollup; the partial months at either edge of the
+    range are summed from the transactions themselves.
+    """
+    by = list(by)
+    r = load()
+    if start_dt is None:
+        parts = [r]
+    else:
+        s, e = pd.Timestamp(start_dt).normalize(), pd.Timestamp(end_dt).normalize()
+        first = s if s.day == 1 else s + pd.offsets.MonthBegin(1)
+        last = e if e.is_month_end else e - pd.offsets.MonthEnd(1)
+        if first <= last:
+            whole = (r["period"] >= first.strftime("%Y-%m")) & (r["period"] <= last.strftime("%Y-%m"))
+            parts = [r[whole]]
+            edges = [(s, first - pd.Timedelta(days=1)), (last + pd.Timedelta(days=1), e)]
+        else:
+            parts, edges = [], [(s, e)]
+        parts += [S.sum_transactions(a, b, by=by) for a, b in edges if a <= b]
+    parts = [p[by + ["amount", "count"]] for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=by + ["amount", "count"])
+    return pd.concat(parts, ignore_index=True).groupby(by, dropna=False, observed=True)[["amount", "count"]].sum().reset_index()
+
+def check() -> pd.DataFrame:
+    """Rows where the persisted rollup disagrees with the raw transactions (empty when
+    consistent), None if it has never been built."""
+    _, df = _persisted()
+    if df is None:
+        return None
+    fresh = aggregate(S.load_transactions())
+    m = fresh.merge(df, on=KEYS, how="outer", suffixes=("", "_rollup")).fillna({"amount": 0.0, "count": 0, "amount_rollup": 0.0, "count_rollup": 0})
+    bad = (m["count"] != m["count_rollup"]) | ((m["amount"] - m["amount_rollup"]).abs() > 1e-6)
+    return m[bad]
+
+if __name__ == "__main__":
+    if "--rebuild" in sys.argv:
+        print(f"Rebuilt rollup: {len(rebuild())} rows")
+    else:
+        bad = check()
+        if bad is None:
+            print("Rollup is not built yet: it is built on the first read, or now with --rebuild.")
+        else:
+            print("Rollup is consistent." if bad.empty else bad.to_string())
+        sys.exit(0 if bad is None or bad.empty else 1)
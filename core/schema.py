@@ -0,0 +1,120 @@
+"""The canonical, typed shape of every table.
+
+Backends run frames through normalize() once per on-disk version, so every
+caller of core.storage gets the dtypes in DTYPES and never converts again:
+datetime64 dates, categorical type/kind, nullable Int32 ids, float64 amounts
+and compact (Arrow-backed when available) strings.
+"""
+import importlib.util
+import pandas as pd
+
+# Bump when SCHEMAS changes shape; backups record it (see core.backup)
+SCHEMA_VERSION = 1
+
+SCHEMAS = {
+    "accounts": ["id", "name", "type", "starting_balance", "created_at"],
+    "categories": ["id", "name", "kind", "is_default", "created_at"],
+    "transactions": ["id", "account_id", "category_id", "amount", "type", "date", "note", "created_at"],
+    "budgets": ["id", "category_id", "period", "amount"],
+}
+
+TYPES = ["income", "expense", "savings"]
+STRING = pd.StringDtype("pyarrow" if importlib.util.find_spec("pyarrow") else "python")
+KIND = pd.CategoricalDtype(TYPES)
+ID = pd.Int32Dtype()
+DATE = "datetime64[ns]"
+
+DTYPES = {
+    "accounts": {"id": ID, "name": STRING, "type": STRING, "starting_balance": "float64", "created_at": STRING},
+    "categories": {"id": ID, "name": STRING, "kind": KIND, "is_default": "int8", "created_at": STRING},
+    "transactions": {"id": ID, "account_id": ID, "category_id": ID, "amount": "float64", "type": KIND,
+                     "date": DATE, "note": STRING, "created_at": STRING},
+    "budgets": {"id": ID, "category_id": ID, "period": STRING, "amount": "float64"},
+}
+
+# Values filled in for missing cells
+DEFAULTS = {
+    "accounts": {"starting_balance": 0.0},
+    "categories": {"is_default": 0},
+    "transactions": {"note": ""},
+    "budgets": {"amount": 0.0},
+}
+
+def _coerce(s: pd.Series, dtype, default=None) -> pd.Series:
+    if s.dtype != dtype:
+        if dtype == DATE:
+            s = pd.to_datetime(s, errors="coerce").astype(DATE)
+        elif dtype is ID or dtype in ("float64", "int8"):
+            s = pd.to_numeric(s, errors="coerce")
+            if default is not None:
+                s = s.fillna(default)
+            if dtype != "float64":
+                s = s.round()  # ids and flags are whole numbers
+            s = s.astype(dtype)
+        elif dtype is KIND:
+            if isinstance(s.dtype, pd.CategoricalDtype) and set(TYPES) <= set(s.cat.categories):
+                return s  # already typed, with extra categories
+            s = s.astype("string").str.strip().str.lower().replace("", pd.NA)
+            # anything outside TYPES is kept as an extra category, so rewriting
+            # the table never drops it (writes reject such values, see validate())
+            extra = sorted(set(s.dropna()) - set(TYPES))
+            s = s.astype(pd.CategoricalDtype(TYPES + extra) if extra else KIND)
+        else:
+            s = s.astype(dtype)
+    if default is not None and s.hasnans:
+        s = s.fillna(default)
+    return s
+
+# Columns whose values must be one of TYPES
+CHOICES = {"transactions": "type", "categories": "kind"}
+
+def validate(kind: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Raise ValueError if rows about to be written have a missing or unknown type/kind."""
+    col = CHOICES.get(kind)
+    if col in df.columns:
+        s = df[col].astype("string").str.strip().str.lower()
+        bad = pd.unique(s[~s.isin(TYPES)].fillna(""))
+        if len(bad):
+            raise ValueError(f"Unknown {col} {', '.join(map(repr, bad[:5]))}; expected one of: {', '.join(TYPES)}")
+    return df
+
+def normalize(kind: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Coerce a raw table (or a column subset of it) to DTYPES."""
+    defaults = DEFAULTS[kind]
+    for col, dtype in DTYPES[kind].items():
+        if col in df.columns:
+            df[col] = _coerce(df[col], dtype, defaults.get(col))
+    return df
+
+def concat(kind: str, frames: list) -> pd.DataFrame:
+    """pd.concat of typed frames, typed again where their categories differ."""
+    return normalize(kind, pd.concat(frames, ignore_index=True))
+
+def month_labels(dates: pd.Series) -> pd.Series:
+    """YYYY-MM of each date (NaN where there is none), formatted once per distinct month."""
+    codes = dates.dt.year * 100 + dates.dt.month
+    labels = {c: f"{int(c) // 100:04d}-{int(c) % 100:02d}" for c in codes.dropna().unique()}
+    return codes.map(labels)
+
+def footprint(kind: str, df: pd.DataFrame) -> dict:
+    """In-memory size of a typed table next to the same data as plain object columns."""
+    return {
+        "table": kind, "rows": len(df),
+        "typed_bytes": int(df.memory_usage(deep=True, index=False).sum()),
+        "object_bytes": int(df.astype(object).memory_usage(deep=True, index=False).sum()),
+    }
+
+def merge_changes(kind: str, cur: pd.DataFrame, inserts=None, updates=None, deletes=()) -> pd.DataFrame:
+    """`cur` with rows whose id is in `deletes` dropped, `updates` (id plus the
+    columns to change) written over the matching rows, and `inserts` appended."""
+    out = cur[~cur["id"].isin(list(deletes))].reset_index(drop=True)
+    if updates is not None and len(updates):
+        upd = normalize(kind, validate(kind, updates).copy())
+        pos = pd.Index(out["id"]).get_indexer(upd["id"])
+        hit = pos >= 0
+        for col in upd.columns.drop("id"):
+            # in out's dtype: a type column loaded with extra categories takes plain TYPES values
+            out.iloc[pos[hit], out.columns.get_loc(col)] = upd[col].astype(out[col].dtype).array[hit]
+    if inserts is not None and len(inserts):
+        out = concat(kind, [out, normalize(kind, validate(kind, inserts)[SCHEMAS[kind]].copy())])
+    return out
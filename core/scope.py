@@ -0,0 +1,198 @@
+"""Ledger handles: one per data directory, so one process can serve many ledgers.
+
+Every module that keeps state about a ledger (the backend's parsed tables,
+the rollup, the fingerprint and search indexes, the dashboard caches) keeps
+it in a State mapping, which reads and writes the dict of the ledger the
+calling thread works on. Streamlit runs each session's script in its own
+thread, so pages call select() at the top and each session gets the ledger
+it picked; work handed to a pool thread takes its ledger along (carry()).
+Threads that never pick one work on config.DATA_DIR, as before.
+
+A process-wide LRU keeps the ledgers' cached state under config.CACHE_MB in
+total: whenever a thread picks a ledger, the ledgers whose state was written
+since they were last measured are measured again (whichever thread wrote it;
+Streamlit runs each rerun on a new thread), and the least recently picked
+ones have their state dropped until the rest fits. Everything dropped is a cache of what is on
+disk, so an evicted ledger just loads again when next used. The ledger being
+picked is never evicted, even if it alone is over the budget.
+"""
+import functools, itertools, os, re, sys, threading, time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from . import config
+
+NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]*")
+
+class Ledger:
+    """Handle on the ledger stored in one data directory."""
+    def __init__(self, path: str):
+        self.path = path
+        self.state = {}  # State name -> dict
+        self.used = 0.0  # time.time() of the last select/use
+        self.size = 0  # nbytes() when last measured
+        self._sizes = {}  # (State name, key) -> (id of the entry, estimated bytes)
+
+    def __repr__(self):
+        return f"Ledger({self.path!r})"
+
+    def nbytes(self) -> int:
+        """Estimated bytes held in this ledger's state (entries are measured once each)."""
+        total, sizes = 0, {}
+        for name, d in list(self.state.items()):
+            for key, value in list(d.items()):
+                hit = self._sizes.get((name, key))
+                if hit is None or hit[0] != id(value):
+                    hit = (id(value), _nbytes(value))
+                sizes[(name, key)] = hit
+                total += hit[1]
+        self._sizes = sizes
+        return total
+
+    def evict(self):
+        self.state, self._sizes, self.size = {}, {}, 0
+
+_ledgers = OrderedDict()  # absolute path -> Ledger, least recently used first
+_dirty = set()  # ledgers whose state changed since they were last measured (see State)
+_lock = threading.Lock()
+_local = threading.local()  # like core.perf: one current ledger per thread
+
+def get(path: str) -> Ledger:
+    """The handle for the ledger in `path` (the same one for every caller in the process)."""
+    key = os.path.abspath(path)
+    with _lock:
+        if key not in _ledgers:
+            _ledgers[key] = Ledger(key)
+        return _ledgers[key]
+
+def current() -> Ledger:
+    """The ledger the calling thread works on."""
+    ledger = getattr(_local, "ledger", None)
+    return ledger if ledger is not None else get(config.DATA_DIR)
+
+def use(path: str = None) -> Ledger:
+    """Work on the ledger in `path` (default config.DATA_DIR) in the calling thread from now on."""
+    ledger = _local.ledger = get(path if path is not None else config.DATA_DIR)
+    with _lock:
+        ledger.used = time.time()
+        _ledgers.move_to_end(ledger.path)
+        while _dirty:  # only these can have grown since they were last measured
+            led = _dirty.pop()
+            led.size = led.nbytes()
+        _trim(ledger)
+    return ledger
+
+def _trim(keep: Ledger):
+    budget = config.CACHE_MB << 20
+    total = sum(led.size for led in _ledgers.values())
+    for led in list(_ledgers.values()):  # least recently used first
+        if total <= budget:
+            break
+        if led is not keep and led.state:
+            total -= led.size
+            led.evict()
+
+def carry(fn):
+    """fn bound to the calling thread's ledger, for work handed to a pool thread."""
+    ledger = current()
+    @functools.wraps(fn)
+    def bound(*args, **kwargs):
+        prev = getattr(_local, "ledger", None)
+        _local.ledger = ledger
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _local.ledger = prev
+    return bound
+
+# ---------- hosted ledgers (config.LEDGERS_DIR) ----------
+def hosted() -> list:
+    """Names of the ledgers under config.LEDGERS_DIR, sorted."""
+    root = config.LEDGERS_DIR
+    if not root or not os.path.isdir(root):
+        return []
+    return sorted(n for n in os.listdir(root) if NAME.fullmatch(n) and os.path.isdir(os.path.join(root, n)))
+
+def hosted_path(name: str) -> str:
+    """Data directory of the hosted ledger `name`; ValueError unless hosting is on and the name is plain."""
+    if not config.LEDGERS_DIR:
+        raise ValueError("Hosting several ledgers needs FLOWFOX_LEDGERS_DIR.")
+    if not NAME.fullmatch(name or "") or ".." in name:
+        raise ValueError("Ledger names are letters, digits, '.', '_' and '-'.")
+    return os.path.join(config.LEDGERS_DIR, name)
+
+def select(session, requested: str = None) -> Ledger:
+    """Pick the ledger for a Streamlit session (call at the top of a page).
+
+    session["ledger"] (set on the Settings page; "" for config.DATA_DIR)
+    wins, then `requested` (the ?ledger= query parameter); the chosen name is
+    remembered in the session. Without config.LEDGERS_DIR, or with neither
+    set, this is config.DATA_DIR. `requested` only opens an existing ledger
+    (one of hosted()): anything else raises ValueError, so a mistyped URL
+    never creates a ledger (that is left to the Settings page).
+    """
+    name = session["ledger"] if "ledger" in session else requested
+    if not config.LEDGERS_DIR or not name:
+        return use()
+    path = hosted_path(name)
+    if "ledger" not in session and name not in hosted():
+        raise ValueError(f"There is no ledger named {name!r}; pick or create one in Settings.")
+    session["ledger"] = name
+    return use(path)
+
+def loaded() -> list:
+    """One row per ledger holding cached state: path, estimated bytes, last used."""
+    with _lock:
+        return [{"ledger": led.path, "bytes": led.size, "used": led.used}
+                for led in reversed(_ledgers.values()) if led.state]
+
+class State(MutableMapping):
+    """A module's per-ledger cache: a dict that belongs to the calling thread's ledger."""
+    def __init__(self, name: str):
+        self.name = name
+
+    def _dict(self, ledger: Ledger = None) -> dict:
+        state = (ledger or current()).state
+        d = state.get(self.name)
+        if d is None:
+            d = state.setdefault(self.name, {})
+        return d
+
+    def _changed(self) -> dict:
+        ledger = current()
+        _dirty.add(ledger)  # measured again on the next use()
+        return self._dict(ledger)
+
+    def __getitem__(self, key): return self._dict()[key]
+    def __setitem__(self, key, value): self._changed()[key] = value
+    def __delitem__(self, key): del self._changed()[key]
+    def __iter__(self): return iter(list(self._dict()))
+    def __len__(self): return len(self._dict())
+    def get(self, key, default=None): return self._dict().get(key, default)  # the hot path: one lookup
+    def clear(self): self._changed().clear()
+
+# ---------- size estimates ----------
+SAMPLE = 100  # big containers are sized from this many of their items
+
+def _nbytes(obj, depth: int = 4) -> int:
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+    if pd is not None and isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(getattr(obj, "nbytes", None), int):
+        return obj.nbytes  # numpy and Arrow arrays
+    size = sys.getsizeof(obj)
+    if depth == 0:
+        return size
+    if isinstance(obj, dict):
+        n, sample = len(obj), list(itertools.islice(obj.items(), SAMPLE))
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n, sample = len(obj), list(itertools.islice(obj, SAMPLE))
+    elif hasattr(obj, "__dict__"):
+        sample = list(vars(obj).values())
+        n = len(sample)
+    else:
+        return size
+    measured = sum(_nbytes(item, depth - 1) for item in sample)
+    return size + (measured * n // len(sample) if sample else 0)
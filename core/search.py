@@ -0,0 +1,116 @@
+"""Search over transaction notes and account/category names.
+
+Notes go through a trigram index over their distinct values: a query term's
+trigrams narrow the candidate notes, which are then checked for the term
+itself. Account and category tables are small enough to match directly. The
+index is kept per process and ledger, and brought up to date by core.storage
+on every transactions write (see apply()); if it falls behind (e.g. another
+process wrote) it is rebuilt on the next search.
+
+Query syntax: whitespace-separated terms, all of which must match (in any of
+the three fields); case-insensitive substring match, or word prefix with a
+trailing `*` (e.g. `coff*`).
+"""
+import re, threading
+from collections import defaultdict
+import numpy as np
+import pandas as pd
+from . import scope, storage as S
+
+class NoteIndex:
+    """Distinct notes, each with a code, and the trigram postings of their lowercased text."""
+    def __init__(self):
+        self.codes = {}  # note -> code
+        self.texts = []  # code -> lowercased note
+        self.grams = defaultdict(set)  # trigram -> codes
+        self._lock = threading.Lock()  # writes add while other sessions search
+
+    def add(self, notes):
+        with self._lock:
+            for note in pd.unique(pd.Series(notes, dtype=object).fillna("")):
+                if note in self.codes:
+                    continue
+                code = self.codes[note] = len(self.texts)
+                text = note.lower()
+                self.texts.append(text)
+                for g in _trigrams(text):
+                    self.grams[g].add(code)
+
+    def match(self, term: str) -> np.ndarray:
+        """Mask over note codes: True where the note matches one query term."""
+        prefix = term.endswith("*")
+        term = term.rstrip("*")
+        grams = _trigrams(term)
+        with self._lock:
+            if grams:
+                candidates = set.intersection(*(self.grams.get(g, set()) for g in grams))
+            else:
+                candidates = range(len(self.texts))  # too short to index: check every distinct note
+            if prefix:
+                word = re.compile(r"\b" + re.escape(term))
+                hits = [c for c in candidates if word.search(self.texts[c])]
+            else:
+                hits = [c for c in candidates if term in self.texts[c]]
+        mask = np.zeros(len(self.texts), dtype=bool)
+        mask[hits] = True
+        return mask
+
+def _trigrams(text: str) -> set:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Per ledger: "notes" -> (transactions version, NoteIndex); "rows" -> (frame, NoteIndex, row codes)
+_STATE = scope.State("search")
+
+def _notes() -> NoteIndex:
+    v = S.version("transactions")
+    hit = _STATE.get("notes")
+    if hit is None or hit[0] != v:
+        index = NoteIndex()
+        index.add(S.load_transactions()["note"])
+        hit = _STATE["notes"] = (v, index)
+    return hit[1]
+
+def apply(before, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+    """Index the notes of a transactions write that moved the table from version `before`."""
+    hit = _STATE.get("notes")
+    if hit is None or hit[0] != before:
+        return  # not built, or already stale: rebuilt on the next search
+    if added is not None and "note" in added.columns:
+        hit[1].add(added["note"])
+    # removed notes stay in the vocabulary; rows no longer point at them
+    _STATE["notes"] = (S.version("transactions"), hit[1])
+
+def _row_codes(frame: pd.DataFrame, index: NoteIndex) -> np.ndarray:
+    """Note code of every row of `frame`, computed once per frame."""
+    hit = _STATE.get("rows")
+    if hit is None or hit[0] is not frame or hit[1] is not index:
+        with index._lock:  # add() may be growing codes from another session's write
+            notes = list(index.codes)
+        hit = _STATE["rows"] = (frame, index, pd.Index(notes).get_indexer(frame["note"].fillna("")))
+    return hit[2]
+
+def _name_ids(names: pd.DataFrame, term: str) -> list:
+    prefix = term.endswith("*")
+    term = re.escape(term.rstrip("*"))
+    hit = names["name"].fillna("").str.contains((r"\b" + term) if prefix else term, case=False, regex=True)
+    return names.loc[hit, "id"].tolist()
+
+def filter_positions(frame: pd.DataFrame, pos: np.ndarray, query: str) -> np.ndarray:
+    """The positions among `pos` (rows of `frame`) whose note, account or category matches `query`."""
+    terms = query.lower().split()
+    if not terms or len(pos) == 0:
+        return pos
+    index = _notes()
+    codes = _row_codes(frame, index)[pos]
+    account = frame["account_id"].to_numpy("float64", na_value=np.nan)[pos]
+    category = frame["category_id"].to_numpy("float64", na_value=np.nan)[pos]
+    accounts, categories = S.load_accounts(), S.load_categories()
+    keep = np.ones(len(pos), dtype=bool)
+    for term in terms:
+        hit = index.match(term)[codes]  # lookup over note codes: one gather, no sort
+        for ids, names in ((account, accounts), (category, categories)):
+            found = _name_ids(names, term)
+            if found:
+                hit |= np.isin(ids, found)
+        keep &= hit
+    return pos[keep]
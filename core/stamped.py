@@ -0,0 +1,44 @@
+"""Files derived from the transactions (the rollup, the fingerprint index).
+
+Each lives in the ledger's directory next to "<file>.version", a stamp holding
+the transactions version it reflects (repr of storage.version()). Readers
+compare the stamp with now() and rebuild on a mismatch, so a file edited by
+hand, or left behind by a writer that crashed halfway, is never trusted.
+"""
+import contextlib, os
+from . import scope, storage as S
+from .writer import exclusive
+
+def now() -> str:
+    """The stamp for the transactions as they are."""
+    return repr(S.version("transactions"))
+
+def read(path: str) -> str:
+    """The stamp of the file at `path`, None if it has none."""
+    path += ".version"
+    if not os.path.exists(path): return None
+    with open(path) as f:
+        return f.read()
+
+def mark(path: str, stamp: str):
+    """Stamp the file at `path` (after every change to it)."""
+    path += ".version"
+    with open(path + ".tmp", "w") as f:
+        f.write(stamp)
+    os.replace(path + ".tmp", path)
+
+def lock():
+    """exclusive() for a rebuild; none (so no lock file) while the ledger's directory doesn't exist."""
+    return exclusive() if os.path.isdir(scope.current().path) else contextlib.nullcontext()
+
+def replace(path: str, write, stamp: str):
+    """Replace the file at `path` with what write(tmp_path) writes, then stamp it.
+
+    Skipped while the ledger's directory doesn't exist: reads don't create it.
+    """
+    if not os.path.isdir(os.path.dirname(path)):
+        return
+    write(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    # stamped last: a crash before this leaves an old stamp and forces a rebuild
+    mark(path, stamp)
@@ -1,39 +1,15 @@
-import os, io, calendar
 from datetime import datetime, date
 import pandas as pd
+from . import config, perf
+from .backends import get as _get_backend
+from .schema import SCHEMAS, footprint, merge_changes, normalize, validate
+from .writer import ConflictError, GroupCommit, check_version, exclusive
 
-DATA_DIR = "data"
-os.makedirs(DATA_DIR, exist_ok=True)
-
-FILES = {
-    "accounts": os.path.join(DATA_DIR, "accounts.csv"),
-    "categories": os.path.join(DATA_DIR, "categories.csv"),
-    "transactions": os.path.join(DATA_DIR, "transactions.csv"),
-    "budgets": os.path.join(DATA_DIR, "budgets.csv"),
-}
-
-SCHEMAS = {
-    "accounts": ["id", "name", "type", "starting_balance", "created_at"],
-    "categories": ["id", "name", "kind", "is_default", "created_at"],
-    "transactions": ["id", "account_id", "category_id", "amount", "type", "date", "note", "created_at"],
-    "budgets": ["id", "category_id", "period", "amount"],
-}
-
-def _ensure_file(kind: str):
-    path = FILES[kind]
-    if not os.path.exists(path):
-        pd.DataFrame(columns=SCHEMAS[kind]).to_csv(path, index=False)
-
-def _read(kind: str, parse_dates=False) -> pd.DataFrame:
-    _ensure_file(kind)
-    if kind == "transactions" and parse_dates:
-        return pd.read_csv(FILES[kind], parse_dates=["date"])
-    return pd.read_csv(FILES[kind])
-
-def _write_atomic(df: pd.DataFrame, path: str):
-    tmp = path + ".tmp"
-    df.to_csv(tmp, index=False)
-    os.replace(tmp, path)
+# Backend selected by FLOWFOX_BACKEND (see core.config); every public
+# function below goes through its primitives. Anything that writes does so
+# under writer.exclusive(), so concurrent sessions and processes don't lose
+# each other's rows or reuse ids.
+_B = _get_backend(config.BACKEND)
 
 def _write(kind: str, df: pd.DataFrame):
     cols = SCHEMAS[kind]
@@ -42,98 +18,267 @@ def _write(kind: str, df: pd.DataFrame):
         if c not in df.columns:
             df[c] = "" if c not in ("starting_balance","amount","is_default","account_id","category_id","id") else 0
     df = df[cols]
-    _write_atomic(df, FILES[kind])
+    _B.write(kind, df)
+
+def _tx_changed(before, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+    """Bring derived tables up to date after a transactions write that started at version `before`."""
+    from . import fingerprints, rollup, search
+    rollup.apply(before, added, removed)
+    search.apply(before, added, removed)
+    fingerprints.apply(before, added, removed)
+
+def _changed_rows(old: pd.DataFrame, new: pd.DataFrame):
+    """Rows only in `old` and rows only in `new`, compared on the columns derived tables use."""
+    cols = ["id", "account_id", "category_id", "amount", "type", "date", "note"]
+    if old.empty or new.empty:
+        return old[cols], new[cols]
+    m = old[cols].merge(new[cols], how="outer", indicator=True)
+    return m[m["_merge"] == "left_only"], m[m["_merge"] == "right_only"]
 
 def _next_id(df: pd.DataFrame) -> int:
     if df.empty: return 1
     return int(df["id"].max()) + 1
 
 # Public API
-def load_accounts() -> pd.DataFrame:
-    df = _read("accounts")
-    if "starting_balance" in df.columns:
-        df["starting_balance"] = pd.to_numeric(df["starting_balance"], errors="coerce").fillna(0.0)
-    return df
-
-def load_categories() -> pd.DataFrame:
-    df = _read("categories")
-    if "is_default" in df.columns:
-        df["is_default"] = pd.to_numeric(df["is_default"], errors="coerce").fillna(0).astype(int)
-    return df
-
-def load_transactions() -> pd.DataFrame:
-    df = _read("transactions", parse_dates=True)
-    numeric_cols = ["amount","account_id","category_id","id"]
-    for c in numeric_cols:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    if "type" in df.columns:
-        df["type"] = df["type"].astype(str)
-    return df
-
-def load_budgets() -> pd.DataFrame:
-    df = _read("budgets")
-    for c in ["id","category_id"]:
-        if c in df.columns:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
-    if "amount" in df.columns:
-        df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
-    return df
-
-def save_accounts(df: pd.DataFrame): _write("accounts", df)
-def save_categories(df: pd.DataFrame): _write("categories", df)
-def save_transactions(df: pd.DataFrame): _write("transactions", df)
-def save_budgets(df: pd.DataFrame): _write("budgets", df)
+def load_accounts() -> pd.DataFrame: return _B.load("accounts")
+def load_categories() -> pd.DataFrame: return _B.load("categories")
+def load_transactions() -> pd.DataFrame: return _B.load("transactions")
+def load_budgets() -> pd.DataFrame: return _B.load("budgets")
+
+def _save(kind: str, df: pd.DataFrame, expected_version=None):
+    validate(kind, df)
+    with exclusive():
+        check_version(_B.version(kind), expected_version)
+        _write(kind, df)
+
+def save_accounts(df: pd.DataFrame, expected_version=None): _save("accounts", df, expected_version)
+def save_categories(df: pd.DataFrame, expected_version=None): _save("categories", df, expected_version)
+def save_transactions(df: pd.DataFrame, expected_version=None):
+    """Replace all transactions; with expected_version, raise ConflictError if
+    they changed since that version was read (see version())."""
+    validate("transactions", df)
+    with exclusive():
+        before, old = _B.version("transactions"), _B.load("transactions")
+        check_version(before, expected_version)
+        _write("transactions", df)
+        removed, added = _changed_rows(old, _B.load("transactions"))
+        _tx_changed(before, added, removed)
+def save_budgets(df: pd.DataFrame, expected_version=None): _save("budgets", df, expected_version)
+
+def restore_table(kind: str, chunks) -> int:
+    """Replace a whole table with the rows of `chunks` (frames with ids), writing
+    each frame as it arrives so the table is never held twice in memory."""
+    count = 0
+    with exclusive():
+        for chunk in chunks:
+            chunk = normalize(kind, validate(kind, chunk)[SCHEMAS[kind]].copy())
+            if count == 0:
+                _write(kind, chunk)
+            else:
+                _B.append(kind, chunk)
+            count += len(chunk)
+        if count == 0:
+            _write(kind, pd.DataFrame(columns=SCHEMAS[kind]))
+    return count
+
+def table_chunks(kind: str, chunksize: int):
+    """The rows of a table, at most `chunksize` at a time, never holding a copy of all of it."""
+    return _B.chunks(kind, chunksize)
+
+def version(kind: str = "transactions"):
+    """Token that changes whenever the table does."""
+    return _B.version(kind)
+
+def compact(kind: str = "transactions"):
+    """Fold pending appends into the table's main storage."""
+    with exclusive():
+        _B.compact(kind)
+
+def memory_report() -> pd.DataFrame:
+    """Rows and in-memory bytes per loaded table, typed vs. as plain object columns."""
+    return pd.DataFrame([footprint(kind, _B.load(kind)) for kind in SCHEMAS])
+
+def load_transactions_between(start_dt: date, end_dt: date, columns=None) -> pd.DataFrame:
+    """Transactions dated start_dt..end_dt (inclusive), optionally only some columns."""
+    return _B.between(start_dt, end_dt, columns)
+
+def load_transactions_by_date() -> pd.DataFrame:
+    """All transactions ordered by (date, id), undated ones last."""
+    return _B.sorted_by_date()
+
+def sum_transactions(start_dt: date = None, end_dt: date = None, by=("type",)) -> pd.DataFrame:
+    """Grouped amount sum and row count, over all transactions or a date range."""
+    return _B.grouped_sum(start_dt, end_dt, by)
 
 def add_account(name: str, type_: str, starting_balance: float = 0.0):
-    acc = load_accounts()
-    if (acc["name"] == name).any(): return  # dedupe by name
-    new_id = _next_id(acc)
-    now = datetime.utcnow().isoformat()
-    row = {"id": new_id, "name": name, "type": type_, "starting_balance": float(starting_balance), "created_at": now}
-    acc = pd.concat([acc, pd.DataFrame([row])], ignore_index=True)
-    save_accounts(acc)
+    with exclusive():
+        acc = load_accounts()
+        if (acc["name"] == name).any(): return  # dedupe by name
+        new_id = _next_id(acc)
+        now = datetime.utcnow().isoformat()
+        row = {"id": new_id, "name": name, "type": type_, "starting_balance": float(starting_balance), "created_at": now}
+        acc = pd.concat([acc, pd.DataFrame([row])], ignore_index=True)
+        _write("accounts", acc)
 
 def add_category(name: str, kind: str, is_default: int = 0):
-    cats = load_categories()
-    if (cats["name"] == name).any(): return
-    new_id = _next_id(cats)
-    now = datetime.utcnow().isoformat()
-    row = {"id": new_id, "name": name, "kind": kind, "is_default": int(is_default), "created_at": now}
-    cats = pd.concat([cats, pd.DataFrame([row])], ignore_index=True)
-    save_categories(cats)
+    validate("categories", pd.DataFrame({"kind": [kind]}))
+    with exclusive():
+        cats = load_categories()
+        if (cats["name"] == name).any(): return
+        new_id = _next_id(cats)
+        now = datetime.utcnow().isoformat()
+        row = {"id": new_id, "name": name, "kind": kind, "is_default": int(is_default), "created_at": now}
+        cats = pd.concat([cats, pd.DataFrame([row])], ignore_index=True)
+        _write("categories", cats)
+
+def _append_transactions(batches: list) -> list:
+    """Group-commit flush: one id block, one append and one derived-table update for all queued batches."""
+    tx = pd.concat(batches, ignore_index=True)
+    start = _B.max_id("transactions") + 1
+    tx.insert(0, "id", range(start, start + len(tx)))
+    before = _B.version("transactions")
+    _B.append("transactions", tx)
+    _tx_changed(before, added=tx)
+    return [len(b) for b in batches]
+
+_TX_QUEUE = GroupCommit(_append_transactions)
 
 def add_transaction(account_id: int, category_id: int, amount: float, type_: str, date_: date, note: str = ""):
-    tx = load_transactions()
-    new_id = _next_id(tx)
-    now = datetime.utcnow().isoformat()
-    row = {
-        "id": new_id, "account_id": int(account_id), "category_id": int(category_id),
-        "amount": float(amount), "type": type_, "date": pd.to_datetime(date_), "note": note, "created_at": now
-    }
-    tx = pd.concat([tx, pd.DataFrame([row])], ignore_index=True)
-    save_transactions(tx)
+    add_transactions(pd.DataFrame([{"account_id": account_id, "category_id": category_id, "amount": amount,
+                                    "type": type_, "date": date_, "note": note}]))
+
+def _new_transactions(rows: pd.DataFrame) -> pd.DataFrame:
+    """Transaction rows (without ids) from account_id, category_id, amount, type, date and optional note."""
+    validate("transactions", rows)
+    note = rows["note"] if "note" in rows.columns else ""
+    return pd.DataFrame({
+        "account_id": rows["account_id"].astype(int).to_numpy(),
+        "category_id": rows["category_id"].astype(int).to_numpy(),
+        "amount": rows["amount"].astype(float).to_numpy(),
+        "type": rows["type"].to_numpy(),
+        "date": pd.to_datetime(rows["date"]).to_numpy(),
+        "note": pd.Series(note, index=rows.index).fillna("").to_numpy(),
+        "created_at": datetime.utcnow().isoformat(),
+    })
+
+def add_transactions(rows: pd.DataFrame) -> int:
+    """Append many transactions with one write; ids are assigned as one contiguous block.
+
+    rows needs account_id, category_id, amount, type and date; note is optional.
+    Calls made at the same time from other sessions are committed together.
+    """
+    tx = _new_transactions(rows)
+    return _TX_QUEUE.submit(tx) if not tx.empty else 0
+
+# Columns an update may change
+EDITABLE = ["account_id", "category_id", "amount", "type", "date", "note"]
+
+def apply_transaction_changes(inserts: pd.DataFrame = None, updates: pd.DataFrame = None, deletes=(),
+                              expected_version=None) -> dict:
+    """Insert, update and delete transactions in one write that only touches changed rows.
+
+    inserts are rows as for add_transactions; updates have an id column plus any
+    of EDITABLE; deletes are ids. With expected_version, raise ConflictError if
+    the transactions changed since then. Returns the number of rows inserted,
+    updated and deleted.
+    """
+    ins = _new_transactions(inserts) if inserts is not None and len(inserts) else None
+    upd = updates if updates is not None and len(updates) else None
+    if upd is not None:
+        unknown = set(upd.columns) - set(EDITABLE) - {"id"}
+        if unknown:
+            raise ValueError(f"Transactions can't update: {', '.join(sorted(unknown))}")
+        validate("transactions", upd)
+    deletes = {int(i) for i in deletes}
+    with exclusive():
+        before, old = _B.version("transactions"), _B.load("transactions")
+        check_version(before, expected_version)
+        deletes &= set(old["id"].astype(int))
+        if upd is not None:
+            upd = upd[upd["id"].isin(old["id"]) & ~upd["id"].isin(list(deletes))]
+        removed = old[old["id"].isin(list(deletes) + ([] if upd is None else list(upd["id"])))]
+        if ins is not None:
+            start = _B.max_id("transactions") + 1
+            ins.insert(0, "id", range(start, start + len(ins)))
+        counts = {"inserted": 0 if ins is None else len(ins), "updated": 0 if upd is None else len(upd),
+                  "deleted": len(deletes)}
+        if not any(counts.values()):
+            return counts
+        _B.apply_changes("transactions", ins, upd, sorted(deletes))
+        added = merge_changes("transactions", removed, ins, upd, deletes)
+        _tx_changed(before, added, removed)
+    return counts
+
+def _ensure_names(kind: str, names, defaults: dict) -> dict:
+    validate(kind, pd.DataFrame([defaults]))
+    with exclusive():
+        df = _B.load(kind)
+        have = set(df["name"])
+        missing = [n for n in pd.unique(pd.Series(names, dtype=object)) if n not in have]
+        if missing:
+            start = _next_id(df)
+            new = pd.DataFrame({"id": range(start, start + len(missing)), "name": missing, **defaults,
+                                "created_at": datetime.utcnow().isoformat()})
+            df = pd.concat([df, new], ignore_index=True)
+            _write(kind, df)
+    return dict(zip(df["name"].iloc[::-1], df["id"].iloc[::-1].astype(int)))  # first match wins
+
+def ensure_accounts(names, type_: str = "bank", starting_balance: float = 0.0) -> dict:
+    """Map account names to ids, creating the missing ones in a single write."""
+    return _ensure_names("accounts", names, {"type": type_, "starting_balance": float(starting_balance)})
+
+def ensure_categories(names, kind: str = "expense", is_default: int = 0) -> dict:
+    """Map category names to ids, creating the missing ones in a single write."""
+    return _ensure_names("categories", names, {"kind": kind, "is_default": int(is_default)})
 
 def upsert_budget(category_id: int, period: str, amount: float):
-    b = load_budgets()
-    # ensure uniqueness on (category_id, period)
-    mask = (b["category_id"] == int(category_id)) & (b["period"] == period)
-    if mask.any():
-        b.loc[mask, "amount"] = float(amount)
-    else:
-        new_id = _next_id(b)
-        row = {"id": new_id, "category_id": int(category_id), "period": period, "amount": float(amount)}
-        b = pd.concat([b, pd.DataFrame([row])], ignore_index=True)
-    save_budgets(b)
+    upsert_budgets(pd.DataFrame({"category_id": [category_id], "period": [period], "amount": [amount]}))
+
+def upsert_budgets(rows: pd.DataFrame) -> int:
+    """Set many budgets (category_id, period "YYYY-MM", amount) in one write.
+
+    Budgets are unique on (category_id, period): existing ones are overwritten
+    and keep their id, new ones get one contiguous id block. If a pair repeats
+    in `rows`, the last one wins. Returns the number of rows written.
+    """
+    if rows.empty:
+        return 0
+    new = pd.DataFrame({
+        "category_id": rows["category_id"].astype(int).to_numpy(),
+        "period": pd.PeriodIndex(rows["period"].astype(str), freq="M").strftime("%Y-%m"),
+        "amount": rows["amount"].astype(float).to_numpy(),
+    }).drop_duplicates(["category_id", "period"], keep="last")
+    with exclusive():
+        start = _B.max_id("budgets") + 1
+        new.insert(0, "id", range(start, start + len(new)))
+        _B.upsert("budgets", new, ["category_id", "period"])
+    return len(new)
+
+def copy_budgets(source_period: str, periods, category_ids=None) -> int:
+    """Copy the budgets set for `source_period` to every period in `periods`
+    (optionally only for some categories), overwriting what is there, in one write."""
+    bud = load_budgets()
+    src = bud[bud["period"] == source_period]
+    if category_ids is not None:
+        src = src[src["category_id"].isin(list(category_ids))]
+    periods = [p for p in periods if p != source_period]
+    if src.empty or not periods:
+        return 0
+    grid = src[["category_id", "amount"]].merge(pd.DataFrame({"period": periods}), how="cross")
+    return upsert_budgets(grid)
 
 def delete_category_by_name(name: str) -> str:
-    cats = load_categories()
-    match = cats[cats["name"] == name]
-    if match.empty: return "not-found"
-    if int(match.iloc[0]["is_default"]) == 1: return "default"
-    # guard if used in transactions
-    tx = load_transactions()
-    if (tx["category_id"] == int(match.iloc[0]["id"])).any(): return "in-use"
-    cats = cats[cats["name"] != name]
-    save_categories(cats)
-    return "deleted"
+    with exclusive():
+        cats = load_categories()
+        match = cats[cats["name"] == name]
+        if match.empty: return "not-found"
+        if int(match.iloc[0]["is_default"]) == 1: return "default"
+        # guard if used in transactions
+        used = sum_transactions(by=["category_id"])
+        if (used["category_id"] == int(match.iloc[0]["id"])).any(): return "in-use"
+        cats = cats[cats["name"] != name]
+        _write("categories", cats)
+        return "deleted"
+
+# Timing and read counts for every public function above (opt-in, see core.perf)
+perf.instrument(globals())
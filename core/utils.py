@@ -1,6 +1,6 @@
-import io
 import pandas as pd
-from . import storage as S
+from . import storage as S, fingerprints
+from .schema import validate
 
 DEFAULT_CATEGORIES = [
     ("Groceries", "expense"), ("Utilities", "expense"), ("Rent", "expense"),
@@ -17,51 +17,41 @@ def ensure_seed_data():
         n,t,b = DEFAULT_ACCOUNT
         S.add_account(n, t, b)
 
-def export_all_tables():
-    csvs = {}
-    for name, loader in {
-        "accounts": S.load_accounts, "categories": S.load_categories,
-        "transactions": S.load_transactions, "budgets": S.load_budgets
-    }.items():
-        df = loader()
-        buf = io.StringIO()
-        df.to_csv(buf, index=False)
-        csvs[name] = buf.getvalue().encode("utf-8")
-    return csvs
+def import_transactions_csv(file, chunksize: int = 10_000, progress=None) -> dict:
+    """Stream a CSV export into the ledger chunk by chunk, one write per chunk.
 
-def import_transactions_csv(file) -> int:
-    df = pd.read_csv(file)
-    cols = {c.lower(): c for c in df.columns}
-    req = {"date","account","category","type","amount"}
-    if not req.issubset(set(cols.keys())):
-        raise ValueError(f"CSV must include: {', '.join(sorted(req))}")
-    accs = S.load_accounts()
-    cats = S.load_categories()
-    count = 0
-    for _, r in df.iterrows():
-        acc = str(r[cols["account"]]).strip()
-        cat = str(r[cols["category"]]).strip()
-        typ = str(r[cols["type"]]).strip()
-        dt  = pd.to_datetime(r[cols["date"]]).date()
-        amt = float(r[cols["amount"]])
-        note = str(r.get(cols.get("note","note"), "") or "")
-
-        # ensure account
-        acc_row = accs[accs["name"] == acc]
-        if acc_row.empty:
-            S.add_account(acc, "bank", 0.0)
-            accs = S.load_accounts()
-            acc_row = accs[accs["name"] == acc]
-        account_id = int(acc_row.iloc[0]["id"])
+    Rows already in the ledger (same fingerprint, see core.fingerprints) are
+    skipped, so importing an overlapping export twice adds nothing the second
+    time. Returns {"inserted": n, "skipped": n}.
 
-        # ensure category
-        cat_row = cats[cats["name"] == cat]
-        if cat_row.empty:
-            S.add_category(cat, "expense", is_default=0)
-            cats = S.load_categories()
-            cat_row = cats[cats["name"] == cat]
-        category_id = int(cat_row.iloc[0]["id"])
-
-        S.add_transaction(account_id, category_id, amt, typ, dt, note)
-        count += 1
-    return count
+    progress, if given, is called after each chunk with (rows imported so far,
+    fraction of the file consumed or None when the size is unknown).
+    """
+    req = {"date","account","category","type","amount"}
+    size = getattr(file, "size", None)
+    count = skipped = 0
+    seen = fingerprints.ImportFilter()
+    for chunk in pd.read_csv(file, chunksize=chunksize):
+        cols = {c.lower(): c for c in chunk.columns}
+        if not req.issubset(set(cols.keys())):
+            raise ValueError(f"CSV must include: {', '.join(sorted(req))}")
+        chunk = chunk.rename(columns={c: k for k, c in cols.items()})
+        validate("transactions", chunk)  # before any account or category is created
+        acc = chunk["account"].astype(str).str.strip()
+        cat = chunk["category"].astype(str).str.strip()
+        acc_ids = S.ensure_accounts(acc.unique())
+        cat_ids = S.ensure_categories(cat.unique())
+        rows = pd.DataFrame({
+            "account_id": acc.map(acc_ids),
+            "category_id": cat.map(cat_ids),
+            "amount": chunk["amount"].astype(float),
+            "type": chunk["type"].astype(str).str.strip().str.lower(),
+            "date": pd.to_datetime(chunk["date"]).dt.normalize(),
+            "note": chunk["note"].fillna("").astype(str) if "note" in chunk.columns else "",
+        })
+        new = seen.new_rows(rows)
+        skipped += int((~new).sum())
+        count += S.add_transactions(rows[new])
+        if progress:
+            progress(count, min(1.0, file.tell() / size) if size else None)
+    return {"inserted": count, "skipped": skipped}
@@ -0,0 +1,109 @@
+"""Single-writer coordination for everything that mutates a ledger's data directory.
+
+Streamlit runs every session as a thread, and several app processes may share
+one data directory. exclusive() serializes writers to the current ledger (see
+core.scope) across both: an in-process re-entrant lock, plus an OS file lock
+on <data dir>/.flowfox.lock held while any thread of this process is writing
+to it. Reads don't take it; writers to other ledgers don't wait.
+
+GroupCommit batches small writes: concurrent submitters queue their items and
+whichever of them gets the lock first flushes the whole queue in one commit,
+so N simultaneous writers cost about one write instead of N.
+"""
+import os, threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from . import scope
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+LOCK_NAME = ".flowfox.lock"
+
+class ConflictError(RuntimeError):
+    """A write was based on a version of the table that has since changed."""
+
+# Per ledger path, kept for the life of the process (unlike cached state,
+# which core.scope may evict, a lock has to stay the same object)
+_locks = {}  # path -> {"mutex": RLock, "depth": re-entry depth, "file": locked file or None}
+_locks_lock = threading.Lock()
+
+def _held() -> dict:
+    path = scope.current().path
+    with _locks_lock:
+        if path not in _locks:
+            _locks[path] = {"mutex": threading.RLock(), "depth": 0, "file": None}
+        return _locks[path]
+
+def _lock_file():
+    path = scope.current().path
+    os.makedirs(path, exist_ok=True)
+    fh = open(os.path.join(path, LOCK_NAME), "a+b")
+    if fcntl:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+    return fh
+
+def _unlock_file(fh):
+    if fcntl:
+        fcntl.flock(fh, fcntl.LOCK_UN)
+    else:
+        fh.seek(0)
+        msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+    fh.close()
+
+@contextmanager
+def exclusive():
+    """Hold the current ledger's write lock (re-entrant within a thread)."""
+    held = _held()
+    with held["mutex"]:
+        if held["depth"] == 0:
+            held["file"] = _lock_file()
+        held["depth"] += 1
+        try:
+            yield
+        finally:
+            held["depth"] -= 1
+            if held["depth"] == 0:
+                fh, held["file"] = held["file"], None
+                _unlock_file(fh)
+
+def check_version(current, expected):
+    """Raise ConflictError unless the table is still at the version the caller read."""
+    if expected is not None and current != expected:
+        raise ConflictError("The data changed since it was loaded; reload and try again.")
+
+class GroupCommit:
+    """Queue of items flushed together under exclusive(), one queue per ledger.
+
+    flush(items) writes a batch and returns one result per item, in order.
+    """
+    def __init__(self, flush):
+        self._flush = flush
+        self._pending = {}  # ledger path -> [(item, future)]
+        self._queue_lock = threading.Lock()
+
+    def submit(self, item):
+        fut = Future()
+        path = scope.current().path
+        with self._queue_lock:
+            self._pending.setdefault(path, []).append((item, fut))
+        with exclusive():
+            # the first submitter to get the lock commits everything queued so far
+            with self._queue_lock:
+                batch = self._pending.pop(path, [])
+            if batch:
+                try:
+                    results = self._flush([i for i, _ in batch])
+                except BaseException as e:
+                    for _, f in batch:
+                        f.set_exception(e)
+                else:
+                    for (_, f), r in zip(batch, results):
+                        f.set_result(r)
+        return fut.result()
@@ -2,10 +2,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from core import storage as S
-from core.logic import get_month_bounds
+from core import perf, scope, storage as S
+from core.logic import get_month_bounds, transactions_page, transaction_totals
 
 st.set_page_config(page_title="Transactions", page_icon="🧾", layout="wide")
+perf.page("Transactions")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
 st.title("🧾 Transactions")
 
 # ---------- Data ----------
@@ -60,96 +66,109 @@ st.markdown("---")
 # ---------- Table / Edit ----------
 st.subheader("Browse, Filter & Edit")
 
-tx = S.load_transactions()
 acc = S.load_accounts()[["id","name"]].rename(columns={"name":"account"})
 cat = categories[["id","name","kind"]].rename(columns={"name":"category"})
 
-if not tx.empty:
-    tx["date"] = pd.to_datetime(tx["date"], errors="coerce")
-    # filter by date
-    if isinstance(start_end, tuple) and len(start_end) == 2:
-        s, e = pd.to_datetime(start_end[0]), pd.to_datetime(start_end[1]) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
-        tx = tx[(tx["date"] >= s) & (tx["date"] <= e)]
-    # type filter
-    if type_filter:
-        tx = tx[tx["type"].isin(type_filter)]
+# filter by date (the whole ledger if no complete range is picked) and type
+if isinstance(start_end, tuple) and len(start_end) == 2:
+    s, e = start_end
 else:
-    tx = pd.DataFrame(columns=["id","date","account_id","category_id","type","amount","note"])
-    st.info("No transactions yet. Add one above.")
-
-# join names
-df = tx.merge(acc, left_on="account_id", right_on="id", how="left", suffixes=("","_acc")).drop(columns=["id_acc"], errors="ignore")
-df = df.merge(cat[["id","category"]], left_on="category_id", right_on="id", how="left", suffixes=("","_cat")).drop(columns=["id_cat"], errors="ignore")
-df = df.rename(columns={"id_x":"id"}).drop(columns=[c for c in ["id_y"] if c in df.columns])
-
-# ensure required columns exist
+    s = e = None
+types = type_filter or None
+query = search.strip() or None
 keep = ["id","date","account","category","type","amount","note"]
-for c in keep:
-    if c not in df.columns:
-        df[c] = None
-
-# ---- DTYPE NORMALIZATION (fixes your error) ----
-df["id"] = pd.to_numeric(df["id"], errors="coerce").astype("Int64")
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
-df["type"] = df["type"].astype(str).fillna("")
-df["amount"] = pd.to_numeric(df["amount"], errors="coerce").fillna(0.0)
-df["note"] = df["note"].astype(str).fillna("").replace({"nan": ""})
-df["account"] = df["account"].astype(str).fillna("")
-df["category"] = df["category"].astype(str).fillna("")
-# -----------------------------------------------
-
-df = df[keep].sort_values(["date","id"], ascending=[False, False])
-
-# totals row
-tot_income = df.loc[df["type"]=="income","amount"].sum() if not df.empty else 0.0
-tot_exp = df.loc[df["type"]=="expense","amount"].sum() if not df.empty else 0.0
-tot_net = tot_income - tot_exp
+
+def with_names(tx: pd.DataFrame) -> pd.DataFrame:
+    """Editor columns for transaction rows, with account and category names joined on."""
+    df = tx.merge(acc.rename(columns={"id": "account_id"}), on="account_id", how="left")
+    df = df.merge(cat[["id","category"]].rename(columns={"id": "category_id"}), on="category_id", how="left")
+    # transaction columns arrive typed from storage; only the joined names can be missing
+    return df.assign(account=df["account"].fillna(""), category=df["category"].fillna(""))[keep]
+
+# page controls; only the visible page is loaded into the editor
+p1, p2, p3 = st.columns([1,1,2])
+with p2:
+    page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+_, n_rows = transactions_page(s, e, types, limit=0, query=query)
+n_pages = max(1, -(-n_rows // page_size))
+with p1:
+    page_no = st.number_input("Page", 1, n_pages, 1, step=1)
+page, _ = transactions_page(s, e, types, offset=(page_no - 1) * page_size, limit=page_size, query=query)
+first = (page_no - 1) * page_size
+p3.caption(f"Rows {first + 1 if n_rows else 0:,}–{first + len(page):,} of {n_rows:,} (newest first)")
+if not n_rows:
+    st.info("No transactions for these filters. Add one above.")
+df = with_names(page)
+
+# totals for the whole filter, not just this page
+tot_income, tot_exp, tot_net = transaction_totals(s, e, types, query)
 t1, t2, t3 = st.columns(3)
 t1.metric("Filtered Income", f"${tot_income:,.2f}")
 t2.metric("Filtered Expenses", f"${tot_exp:,.2f}")
 t3.metric("Net", f"${tot_net:,.2f}")
 
-edited = st.data_editor(
+# Version the editor's rows were read at, held while edits are pending so that
+# saving them can't overwrite changes another session made in the meantime.
+st.session_state.setdefault("txn_editor_gen", 0)
+# pending edits are row positions on this page, so a different page or filter starts a fresh editor
+editor_key = f"txn_editor_table_{st.session_state['txn_editor_gen']}_{hash((s, e, tuple(types or ()), query, page_no, page_size))}"
+pending = st.session_state.get(editor_key, {})
+if not any(pending.get(k) for k in ("edited_rows", "added_rows", "deleted_rows")):
+    st.session_state["txn_version"] = S.version("transactions")
+
+df = df.reset_index(drop=True)  # editor row positions index df
+st.data_editor(
     df,
     num_rows="dynamic",
     use_container_width=True,
     column_config={
         "id": st.column_config.NumberColumn("ID", disabled=True),
         "date": st.column_config.DateColumn("Date"),
+        "account": st.column_config.SelectboxColumn("Account", options=acc["account"].tolist()),
+        "category": st.column_config.SelectboxColumn("Category", options=cat["category"].tolist()),
         "type": st.column_config.SelectboxColumn("Type", options=["income","expense","savings"]),
         "amount": st.column_config.NumberColumn("Amount", step=1.0, format="%.2f"),
         "note": st.column_config.TextColumn("Note"),
     },
-    key="txn_editor_table",
+    key=editor_key,
 )
 
-# Detect deletions/updates
-orig_ids = set(pd.to_numeric(df["id"], errors="coerce").dropna().astype(int))
-new_ids = set(pd.to_numeric(edited["id"], errors="coerce").dropna().astype(int))
-deleted = orig_ids - new_ids
-updated = edited[edited["id"].isin(orig_ids & new_ids)]
+def change_set(state: dict):
+    """Inserts, updates and deletes from the editor's pending edits."""
+    ids = df["id"].to_numpy()
+    names = {"account": dict(zip(acc["account"], acc["id"])), "category": dict(zip(cat["category"], cat["id"]))}
+    def with_ids(rows: pd.DataFrame) -> pd.DataFrame:
+        for col in ("account", "category"):
+            if col in rows.columns:
+                rows[col + "_id"] = rows.pop(col).map(names[col])
+        return rows
+    deletes = [int(ids[i]) for i in state.get("deleted_rows", [])]
+    updates = with_ids(pd.DataFrame.from_dict(state.get("edited_rows", {}), orient="index"))
+    if not updates.empty:
+        updates.insert(0, "id", ids[updates.index.astype(int)])
+    inserts = with_ids(pd.DataFrame(state.get("added_rows", []), columns=keep[1:]))
+    complete = inserts[["date","account_id","category_id","type","amount"]].notna().all(axis=1)
+    return inserts[complete], updates, deletes, int((~complete).sum())
 
 cA, cB = st.columns([1,1])
 with cA:
     if st.button("💾 Save Changes"):
-        master = S.load_transactions()
-        # delete
-        if not master.empty and deleted:
-            master = master[~master["id"].isin(list(deleted))]
-        # update mutable fields (date, type, amount, note)
-        for _, r in updated.iterrows():
-            mid = int(r["id"])
-            mask = master["id"] == mid
-            if mask.any():
-                master.loc[mask, "date"] = pd.to_datetime(r["date"])
-                master.loc[mask, "type"] = str(r["type"])
-                master.loc[mask, "amount"] = float(r["amount"])
-                master.loc[mask, "note"] = ("" if pd.isna(r.get("note")) else str(r.get("note")))
-        S.save_transactions(master)
-        st.success("Changes saved.")
+        inserts, updates, deletes, skipped = change_set(pending)
+        try:
+            n = S.apply_transaction_changes(inserts, updates, deletes, expected_version=st.session_state["txn_version"])
+            st.session_state["txn_editor_gen"] += 1  # start the editor over from the saved rows
+            st.session_state["txn_saved"] = (n, skipped)
+            st.rerun()
+        except S.ConflictError:
+            st.error("Transactions were changed by someone else since this table loaded; your edits were not saved. Reload the page and try again.")
+    if "txn_saved" in st.session_state:
+        n, skipped = st.session_state.pop("txn_saved")
+        st.success(f"Changes saved: {n['inserted']} added, {n['updated']} updated, {n['deleted']} deleted.")
+        if skipped:
+            st.warning(f"{skipped} new row(s) were missing a date, account, category, type or amount and were not added.")
 with cB:
-    @st.cache_data
-    def to_csv(d: pd.DataFrame) -> bytes:
-        return d.to_csv(index=False).encode("utf-8")
-    st.download_button("⬇️ Export filtered CSV", data=to_csv(df),
-                       file_name="transactions_filtered.csv", mime="text/csv")
+    # every filtered row, so only built on request
+    if st.button("⬇️ Export filtered CSV"):
+        rows, _ = transactions_page(s, e, types, limit=n_rows, query=query)
+        st.download_button("Download transactions_filtered.csv", data=with_names(rows).to_csv(index=False).encode("utf-8"),
+                           file_name="transactions_filtered.csv", mime="text/csv")
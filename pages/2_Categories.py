@@ -1,8 +1,14 @@
 import streamlit as st
 import pandas as pd
-from core import storage as S
+from core import perf, scope, storage as S
 
 st.set_page_config(page_title="Categories", page_icon="🗂️", layout="wide")
+perf.page("Categories")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
 st.title("🗂️ Categories")
 
 cats = S.load_categories().sort_values(["kind","name"])
@@ -1,22 +1,26 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from core import storage as S
+from core import perf, scope, storage as S, ledger, rollup
 
 st.set_page_config(page_title="Accounts", page_icon="🏦", layout="wide")
+perf.page("Accounts")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
 st.title("🏦 Accounts")
 
 acc = S.load_accounts()
-tx = S.load_transactions()
 
 # metrics
 if not acc.empty:
-    income = tx[tx["type"]=="income"].groupby("account_id")["amount"].sum() if not tx.empty else pd.Series(dtype=float)
-    expense = tx[tx["type"]=="expense"].groupby("account_id")["amount"].sum() if not tx.empty else pd.Series(dtype=float)
-
-    acc["income_in"] = acc["id"].map(income).fillna(0.0)
-    acc["expense_out"] = acc["id"].map(expense).fillna(0.0)
-    acc["current_balance"] = acc["starting_balance"] + acc["income_in"] - acc["expense_out"]
+    flows = rollup.totals(by=["account_id", "type"])
+    flows = flows.pivot_table(index="account_id", columns="type", values="amount", aggfunc="sum", observed=True)
+    for col, kind in [("income_in", "income"), ("expense_out", "expense"), ("savings_out", "savings")]:
+        acc[col] = acc["id"].map(flows[kind]).fillna(0.0) if kind in flows.columns else 0.0
+    acc["current_balance"] = acc["id"].map(ledger.balances().set_index("account_id")["balance"])
 
     c1, c2, c3 = st.columns(3)
     c1.metric("Accounts", f"{len(acc)}")
@@ -28,8 +32,15 @@ if not acc.empty:
     fig.update_layout(xaxis_title="", yaxis_title="Current Balance")
     st.plotly_chart(fig, use_container_width=True)
 
+    series = ledger.balance_series()
+    if not series.empty:
+        st.subheader("Balance Over Time")
+        fig = px.line(series, x="period", y="balance", color="account", markers=True)
+        fig.update_layout(xaxis_title="", yaxis_title="Month-end Balance")
+        st.plotly_chart(fig, use_container_width=True)
+
     st.subheader("Accounts Table")
-    st.dataframe(acc[["id","name","type","starting_balance","income_in","expense_out","current_balance"]],
+    st.dataframe(acc[["id","name","type","starting_balance","income_in","expense_out","savings_out","current_balance"]],
                  use_container_width=True)
 else:
     st.info("No accounts yet. Add one below.")
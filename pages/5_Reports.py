@@ -4,10 +4,16 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import date
-from core import storage as S
-from core.logic import get_month_bounds, monthly_cashflow
+from core import perf, scope
+from core.logic import all_time_totals, budget_matrix, dashboard, get_month_bounds, precompute, transactions_preview
 
 st.set_page_config(page_title="Reports", page_icon="📊", layout="wide")
+perf.page("Reports")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))
+except ValueError as e:
+    st.error(str(e))
+    st.stop()
 st.title("📊 Reports")
 
 # ----------------------- Helpers -----------------------
@@ -17,19 +23,6 @@ def money(x: float) -> str:
     except Exception:
         return "$0.00"
 
-def safe_to_datetime(s):
-    return pd.to_datetime(s, errors="coerce")
-
-# ----------------------- Data --------------------------
-tx = S.load_transactions()
-cats = S.load_categories()
-acc = S.load_accounts()
-budgets = S.load_budgets()
-
-# Ensure types
-if not tx.empty:
-    tx["date"] = safe_to_datetime(tx["date"])
-
 # Sidebar filters
 with st.sidebar:
     st.header("Filters")
@@ -38,15 +31,25 @@ with st.sidebar:
     month = st.number_input("Month", 1, 12, today.month, step=1)
     months_back = st.slider("Show last N months (trends)", 3, 24, 6)
 
-start_dt, end_dt = get_month_bounds(year, month)
 period_label = f"{year:04d}-{month:02d}"
+start_dt, end_dt = get_month_bounds(year, month)
+end = pd.Period(period_label, freq="M")
+granularity = st.session_state.get("report_granularity", "month")  # the radio lives in the Trends tab
+
+# ----------------------- Data --------------------------
+# Every tab's aggregation starts now on the shared pool (memoized per data
+# version and filters); each tab waits only for its own result, so the
+# Overview draws as soon as it is ready while the others finish behind it.
+totals_f = precompute(all_time_totals)
+overview_f = precompute(dashboard, int(year), int(month), int(months_back), "month")
+trends_f = precompute(dashboard, int(year), int(month), int(months_back), granularity)
+budgets_f = precompute(budget_matrix, str(end - 23), str(end))
+data_f = precompute(transactions_preview, start_dt, end_dt)
 
 # KPIs (all-time)
-income = float(tx.loc[tx["type"] == "income", "amount"].sum()) if not tx.empty else 0.0
-expenses = float(tx.loc[tx["type"] == "expense", "amount"].sum()) if not tx.empty else 0.0
-starts = float(acc["starting_balance"].sum()) if not acc.empty else 0.0
-net = income - expenses
-savings_now = net + starts
+income, expenses, net = totals_f.result()
+dash = overview_f.result()
+savings_now = dash.savings
 
 c1, c2, c3, c4 = st.columns(4)
 c1.metric("Total Income", money(income))
@@ -67,75 +70,41 @@ tab_overview, tab_trends, tab_budgets, tab_data = st.tabs(
 with tab_overview:
     st.subheader(f"Overview for {period_label}")
 
-    # Filter this-month data
-    tx_month = tx[(tx["date"] >= pd.to_datetime(start_dt)) & (tx["date"] <= pd.to_datetime(end_dt))] if not tx.empty else tx
-    month_income = float(tx_month.loc[tx_month["type"] == "income", "amount"].sum()) if not tx_month.empty else 0.0
-    month_expense = float(tx_month.loc[tx_month["type"] == "expense", "amount"].sum()) if not tx_month.empty else 0.0
-    month_net = month_income - month_expense
-
     k1, k2, k3 = st.columns(3)
-    k1.metric("This Month • Income", money(month_income))
-    k2.metric("This Month • Expenses", money(month_expense))
-    k3.metric("This Month • Net", money(month_net))
+    k1.metric("This Month • Income", money(dash.income))
+    k2.metric("This Month • Expenses", money(dash.expenses))
+    k3.metric("This Month • Net", money(dash.net))
 
     # Category splits (pie/donut)
     left, right = st.columns(2)
-    # Expenses by category
-    if not tx_month.empty:
-        exp_m = tx_month[tx_month["type"] == "expense"]
-        if not exp_m.empty:
-            exp_merge = exp_m.merge(
-                cats[["id", "name"]].rename(columns={"id": "category_id", "name": "category"}),
-                on="category_id", how="left"
-            )
-            exp_by_cat = exp_merge.groupby("category", dropna=False)["amount"].sum().reset_index().sort_values("amount", ascending=False)
-            with left:
-                st.caption("Expense Share by Category")
-                fig_exp = px.pie(exp_by_cat, names="category", values="amount", hole=0.55)
-                fig_exp.update_traces(textposition="inside", textinfo="percent+label")
-                st.plotly_chart(fig_exp, use_container_width=True)
-        else:
-            left.info("No expenses this month.")
-        # Income by category
-        inc_m = tx_month[tx_month["type"] == "income"]
-        if not inc_m.empty:
-            inc_merge = inc_m.merge(
-                cats[["id", "name"]].rename(columns={"id": "category_id", "name": "category"}),
-                on="category_id", how="left"
-            )
-            inc_by_cat = inc_merge.groupby("category", dropna=False)["amount"].sum().reset_index().sort_values("amount", ascending=False)
-            with right:
-                st.caption("Income Share by Category")
-                fig_inc = px.pie(inc_by_cat, names="category", values="amount", hole=0.35)
-                fig_inc.update_traces(textposition="inside", textinfo="percent+label")
-                st.plotly_chart(fig_inc, use_container_width=True)
-        else:
-            right.info("No income this month.")
+    if dash.expense_by_category.empty:
+        left.info("No expenses this month.")
     else:
-        left.info("No transactions this month.")
-        right.info("No transactions this month.")
+        with left:
+            st.caption("Expense Share by Category")
+            fig_exp = px.pie(dash.expense_by_category, names="category", values="amount", hole=0.55)
+            fig_exp.update_traces(textposition="inside", textinfo="percent+label")
+            st.plotly_chart(fig_exp, use_container_width=True)
+    if dash.income_by_category.empty:
+        right.info("No income this month.")
+    else:
+        with right:
+            st.caption("Income Share by Category")
+            fig_inc = px.pie(dash.income_by_category, names="category", values="amount", hole=0.35)
+            fig_inc.update_traces(textposition="inside", textinfo="percent+label")
+            st.plotly_chart(fig_inc, use_container_width=True)
 
     st.markdown("### Top Categories (This Month)")
     cols = st.columns(2)
-    # Top 5 expense categories bar
-    if not tx_month.empty and not exp_m.empty:
-        top_exp = exp_by_cat.head(5).sort_values("amount")
-        with cols[0]:
-            fig = px.bar(top_exp, x="amount", y="category", orientation="h", title="Top 5 Expenses")
-            fig.update_layout(yaxis_title="", xaxis_title="")
+    for col, top, title, empty in ((cols[0], dash.top_expenses, "Top 5 Expenses", "No expenses to show."),
+                                   (cols[1], dash.top_income, "Top 5 Income", "No income to show.")):
+        if top.empty:
+            col.info(empty)
+            continue
+        with col:
+            fig = px.bar(top, x="amount", y="category", orientation="h", title=title)
+            fig.update_layout(yaxis_title="", xaxis_title="", yaxis_autorange="reversed")  # largest on top
             st.plotly_chart(fig, use_container_width=True)
-    else:
-        cols[0].info("No expenses to show.")
-
-    # Top 5 income categories bar
-    if not tx_month.empty and not inc_m.empty:
-        top_inc = inc_by_cat.head(5).sort_values("amount")
-        with cols[1]:
-            fig = px.bar(top_inc, x="amount", y="category", orientation="h", title="Top 5 Income")
-            fig.update_layout(yaxis_title="", xaxis_title="")
-            st.plotly_chart(fig, use_container_width=True)
-    else:
-        cols[1].info("No income to show.")
 
 # =======================================================
 # ====================== TRENDS =========================
@@ -143,15 +112,53 @@ with tab_overview:
 with tab_trends:
     st.subheader(f"Trends (last {months_back} months, ending {period_label})")
 
-    cf = monthly_cashflow(reference_year=year, reference_month=month, months=months_back)
+    st.radio("Granularity", ["week", "month", "quarter", "year"], index=1,
+             horizontal=True, format_func=str.capitalize, key="report_granularity")
+    cf = trends_f.result().trend
     if cf.empty:
         st.info("Add transactions to see trends.")
     else:
         # Line chart for income/expenses/net
-        st.caption("Income, Expenses, and Net by Month")
+        st.caption(f"Income, Expenses, and Net by {granularity.capitalize()}")
         fig_line = go.Figure()
         fig_line.add_trace(go.Scatter(x=cf["period"], y=cf["income"], mode="lines+markers", name="Income"))
         fig_line.add_trace(go.Scatter(x=cf["period"], y=cf["expenses"], mode="lines+markers", name="Expenses"))
         fig_line.add_trace(go.Scatter(x=cf["period"], y=cf["net"], mode="lines+markers", name="Net"))
         fig_line.update_layout(xaxis_title="", yaxis_title="Amount", hovermode="x unified")
         st.plotly_chart(fig_line, use_container_width=True)
+
+# =======================================================
+# ====================== BUDGETS ========================
+# =======================================================
+with tab_budgets:
+    st.subheader(f"Budget Utilization (24 months ending {period_label})")
+    bm = budgets_f.result()
+    if bm.empty or not (bm["budget"] > 0).any():
+        st.info("Set budgets on the Budgets page to see utilization here.")
+    else:
+        heat = bm.pivot(index="category", columns="period", values="utilization") * 100
+        fig_heat = px.imshow(heat, color_continuous_scale="RdYlGn_r", zmin=0, zmax=150, aspect="auto",
+                             labels={"x": "", "y": "", "color": "% used"})
+        fig_heat.update_traces(hovertemplate="%{y} · %{x}<br>%{z:.0f}% of budget<extra></extra>")
+        st.plotly_chart(fig_heat, use_container_width=True)
+        st.caption("Blank cells have no budget set. Over 150% shows as the deepest red.")
+
+        last = bm[bm["period"] == str(end)].sort_values("rollover")
+        st.markdown("### Carried Into Next Month")
+        st.dataframe(last[["category", "budget", "spent", "rollover"]], use_container_width=True, hide_index=True,
+                     column_config={c: st.column_config.NumberColumn(c.capitalize(), format="$%.2f")
+                                    for c in ["budget", "spent", "rollover"]})
+
+# =======================================================
+# ======================== DATA =========================
+# =======================================================
+with tab_data:
+    st.subheader(f"Transactions for {period_label}")
+    rows, n_rows = data_f.result()
+    if rows.empty:
+        st.info("No transactions this month.")
+    else:
+        st.caption(f"Newest {len(rows):,} of {n_rows:,}." if n_rows > len(rows) else f"{n_rows:,} transactions.")
+        st.dataframe(rows, use_container_width=True, hide_index=True,
+                     column_config={"date": st.column_config.DateColumn("Date"),
+                                    "amount": st.column_config.NumberColumn("Amount", format="$%.2f")})
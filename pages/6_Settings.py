@@ -1,14 +1,72 @@
+import io
+from datetime import date
+import pandas as pd
 import streamlit as st
-from core.utils import export_all_tables, import_transactions_csv
-from core import storage as S
+from core.utils import ensure_seed_data, import_transactions_csv
+from core.backup import read_manifest, restore_backup, write_backup
+from core import config, perf, scope, storage as S
 
 st.set_page_config(page_title="Settings", page_icon="⚙️", layout="wide")
+perf.page("Settings")
+try:
+    scope.select(st.session_state, st.query_params.get("ledger"))
+except ValueError as e:
+    st.error(str(e))
+    scope.use()  # still lets the session pick or create one below
 st.title("⚙️ Settings")
 
-st.subheader("Backup / Export")
-csvs = export_all_tables()
-for name, csv_bytes in csvs.items():
-    st.download_button(f"Download {name}.csv", data=csv_bytes, file_name=f"{name}.csv", mime="text/csv")
+if config.LEDGERS_DIR:
+    st.subheader("Ledger")
+    st.caption("This server hosts one ledger per folder under FLOWFOX_LEDGERS_DIR; the choice applies to this session only.")
+    names = [""] + scope.hosted()
+    here = st.session_state.get("ledger") or ""
+    if here not in names:
+        names.append(here)
+    st.selectbox("Work on", names, index=names.index(here), key="ledger_picker",
+                 format_func=lambda n: n or f"Default ({config.DATA_DIR})",
+                 on_change=lambda: st.session_state.update(ledger=st.session_state["ledger_picker"]))
+    with st.form("new_ledger", clear_on_submit=True):
+        new = st.text_input("New ledger", placeholder="e.g. smith-household")
+        if st.form_submit_button("Create and switch"):
+            try:
+                scope.use(scope.hosted_path(new.strip()))
+            except ValueError as e:
+                st.error(str(e))
+            else:
+                ensure_seed_data()
+                st.session_state["ledger"] = new.strip()
+                st.rerun()
+    st.divider()
+
+st.subheader("Backup / Restore")
+st.caption("One zip with every table as CSV and a manifest of row counts, checksums and schema version.")
+# built only on request: the archive is written chunk by chunk when the button is pressed
+if st.button("Prepare backup"):
+    with st.spinner("Writing backup…"):
+        buf = io.BytesIO()
+        manifest = write_backup(buf)
+    rows = ", ".join(f"{t['rows']:,} {name}" for name, t in manifest["tables"].items())
+    st.download_button("Download backup (.zip)", data=buf.getvalue(), file_name=f"flowfox-backup-{date.today()}.zip",
+                       mime="application/zip", help=rows)
+
+archive = st.file_uploader("Restore from a backup", type=["zip"])
+if archive:
+    try:
+        manifest = read_manifest(archive)
+    except Exception as e:
+        st.error(f"Can't read backup: {e}")
+    else:
+        st.caption(f"Backup from {manifest.get('created', 'unknown date')} (schema version {manifest['schema_version']})")
+        st.dataframe(pd.DataFrame([{"table": name, "rows": t["rows"]} for name, t in manifest["tables"].items()]),
+                     hide_index=True)
+        confirm = st.checkbox("Replace all current data with this backup")
+        if st.button("Restore", disabled=not confirm, type="primary"):
+            try:
+                with st.spinner("Restoring…"):
+                    counts = restore_backup(archive)
+                st.success("Restored " + ", ".join(f"{n:,} {name}" for name, n in counts.items()) + ".")
+            except Exception as e:
+                st.error(f"Restore failed: {e}")
 
 st.divider()
 st.subheader("Import Transactions (CSV)")
@@ -16,11 +74,48 @@ st.caption("Columns required: date, account, category, type (income|expense|savi
 upload = st.file_uploader("Upload CSV", type=["csv"])
 if upload:
     try:
-        count = import_transactions_csv(upload)
-        st.success(f"Imported {count} transactions.")
+        bar = st.progress(0.0, text="Importing…")
+        result = import_transactions_csv(
+            upload, progress=lambda n, frac: bar.progress(frac or 0.0, text=f"Imported {n:,} rows…"))
+        bar.empty()
+        msg = f"Imported {result['inserted']} transactions."
+        if result["skipped"]:
+            msg += f" Skipped {result['skipped']} already in the ledger."
+        st.success(msg)
     except Exception as e:
         st.error(f"Import failed: {e}")
 
+with st.expander("Storage footprint"):
+    st.caption("Memory used by each table as loaded (typed columns) vs. the same data as plain Python objects.")
+    st.dataframe(S.memory_report(), use_container_width=True, hide_index=True)
+    if config.LEDGERS_DIR:
+        st.caption(f"Ledgers with tables cached in this server process, most recently used first "
+                   f"(the coldest are dropped above FLOWFOX_CACHE_MB = {config.CACHE_MB:,} MB).")
+        st.dataframe(pd.DataFrame(scope.loaded(), columns=["ledger", "bytes", "used"]).assign(
+            used=lambda d: pd.to_datetime(d["used"], unit="s")), use_container_width=True, hide_index=True)
+
+st.divider()
+st.subheader("Performance")
+recording = st.toggle("Record storage and logic timings", value=perf.enabled(),
+                      help="For every session of this app process; FLOWFOX_PERF=1 turns it on at startup.")
+if recording != perf.enabled():
+    perf.enable(recording)
+last_n = st.slider("Reruns to show", 1, perf.MAX_RUNS, 10)
+runs = perf.summary(last_n)
+if runs.empty:
+    st.caption("Nothing recorded yet: turn recording on, then use the other pages.")
+else:
+    st.caption("Last reruns, newest first. wall_s is the time from the top of the page to its last recorded call.")
+    st.dataframe(runs, use_container_width=True, hide_index=True)
+    st.caption("Top offenders over those reruns. Times include nested calls; per_run is calls per rerun of that page, "
+               "and `read …` rows are files parsed from disk.")
+    st.dataframe(perf.offenders(last_n), use_container_width=True, hide_index=True)
+    e1, e2 = st.columns([1, 1])
+    e1.download_button("Export JSON", data=perf.export(last_n), file_name="flowfox-performance.json", mime="application/json")
+    if e2.button("Clear recorded runs"):
+        perf.clear()
+        st.rerun()
+
 st.divider()
 st.subheader("Danger Zone")
 if st.button("Delete ALL data (irreversible)"):
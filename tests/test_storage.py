@@ -0,0 +1,45 @@
+import os
+from datetime import date
+import pandas as pd
+import pytest
+from core import config, scope, storage as S
+from core.utils import ensure_seed_data
+
+pytestmark = pytest.mark.skipif(config.BACKEND != "csv" or config.FORMAT != "csv",
+                                reason="writes a legacy row straight into a CSV partition")
+
+@pytest.fixture
+def ledger(tmp_path):
+    scope.use(str(tmp_path))
+    ensure_seed_data()
+    yield str(tmp_path)
+    scope.use()
+
+def _legacy_row(ledger, month, id_):
+    """A row with a type from before types were validated, as left in a partition file."""
+    with open(os.path.join(ledger, "transactions", month + ".csv"), "a") as f:
+        f.write(f"{id_},1,1,7.0,transfer,{month}-05,legacy,{month}-05T00:00:00\n")
+
+@pytest.mark.parametrize("legacy_month", ["2025-09", "2025-08"])  # same partition as the edit, and another
+def test_edit_type_next_to_unknown_type(ledger, legacy_month):
+    S.add_transaction(1, 1, 5.0, "expense", date(2025, 8, 1))
+    S.add_transaction(1, 1, 6.0, "income", date(2025, 9, 2))
+    _legacy_row(ledger, legacy_month, 99)
+    tx = S.load_transactions()
+    edited = int(tx.loc[tx["amount"] == 6.0, "id"].iloc[0])
+
+    counts = S.apply_transaction_changes(updates=pd.DataFrame({"id": [edited], "type": ["savings"]}),
+                                         expected_version=S.version())
+
+    assert counts["updated"] == 1
+    tx = S.load_transactions().set_index("id")
+    assert tx.loc[edited, "type"] == "savings"
+    assert tx.loc[99, "type"] == "transfer"
+
+def test_unknown_type_rejected(ledger):
+    with pytest.raises(ValueError):
+        S.add_transaction(1, 1, 5.0, "transfer", date(2025, 9, 1))
+    S.add_transaction(1, 1, 5.0, "expense", date(2025, 9, 1))
+    edited = int(S.load_transactions()["id"].iloc[0])
+    with pytest.raises(ValueError):
+        S.apply_transaction_changes(updates=pd.DataFrame({"id": [edited], "type": ["transfer"]}))